@@ -0,0 +1,108 @@
+"""
+Pool of reusable agents for long-running processes.
+Agents are built once from a shared InstaContentFactory and leased out per
+request, so a server or batch run pays the construction cost at startup
+instead of for every product.
+"""
+import queue
+import threading
+from contextlib import contextmanager
+
+# Agents the ideation pipeline takes from the factory per run, by (role, stage); the stage is
+# only given for roles that serve several stages, each with its own model route
+AGENT_ROLES = {
+    ("product_competitor_agent", "product_analysis"): 1,
+    ("product_competitor_agent", "competitor_analysis"): 1,
+    ("strategy_planner_agent", None): 1,
+    ("creative_content_creator_agent", None): 1,
+    ("senior_photographer_agent", None): 1,
+    ("chief_creative_director_agent", None): 1,
+}
+
+
+class AgentLease:
+    """Factory-compatible view of a set of pooled agents, valid for one run."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._taken = []
+
+    def _take(self, role, stage=None):
+        agent = self._pool.take(role, stage)
+        self._taken.append(((role, stage), agent))
+        return agent
+
+    def product_competitor_agent(self, stage="product_analysis"):
+        return self._take("product_competitor_agent", stage)
+
+    def strategy_planner_agent(self):
+        return self._take("strategy_planner_agent")
+
+    def creative_content_creator_agent(self):
+        return self._take("creative_content_creator_agent")
+
+    def senior_photographer_agent(self):
+        return self._take("senior_photographer_agent")
+
+    def chief_creative_director_agent(self):
+        return self._take("chief_creative_director_agent")
+
+    def release(self):
+        for (role, stage), agent in self._taken:
+            self._pool.give_back(role, agent, stage)
+        self._taken = []
+
+
+class AgentPool:
+    """Prebuilt agents per role, sized for `size` concurrent runs."""
+
+    def __init__(self, factory, size=4):
+        self.factory = factory
+        self.size = size
+        self.created = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+        self._idle = {slot: queue.LifoQueue() for slot in AGENT_ROLES}
+        for (role, stage), per_run in AGENT_ROLES.items():
+            for _ in range(per_run * size):
+                self._idle[(role, stage)].put(self._build(role, stage))
+
+    def _build(self, role, stage=None):
+        with self._lock:
+            self.created += 1
+        build = getattr(self.factory, role)
+        return build(stage) if stage is not None else build()
+
+    def take(self, role, stage=None):
+        """Return an idle agent for the role (and stage), building a new one if the pool is drained."""
+        idle = self._idle.get((role, stage))
+        try:
+            agent = idle.get_nowait() if idle is not None else None
+        except queue.Empty:
+            agent = None
+        if agent is None:
+            return self._build(role, stage)
+        with self._lock:
+            self.reused += 1
+        return agent
+
+    def give_back(self, role, agent, stage=None):
+        """Reset per-run state and return the agent to the pool, unless the pool is already full."""
+        agent.callbacks = None
+        agent.crew = None
+        slot = (role, stage)
+        if slot in self._idle and self._idle[slot].qsize() < AGENT_ROLES[slot] * self.size:
+            self._idle[slot].put(agent)
+
+    @contextmanager
+    def lease(self):
+        """Lease agents for one run: `with pool.lease() as agents: run_ideation(tasks, agents, ...)`."""
+        lease = AgentLease(self)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    def stats(self):
+        with self._lock:
+            return {"created": self.created, "reused": self.reused}
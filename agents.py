@@ -1,19 +1,25 @@
 from crewai import Agent
 from config import config
-from tools import available_tools, BrowserTools, SearchTools
+from iteration import iteration_controller
+from routing import model_router
+from tools import available_tools, BrowserTools, SearchTools, KnowledgeTools
 from textwrap import dedent
 
 
 class InstaContentFactory:
     
-    def __init__(self, additional_tools=None):
+    def __init__(self, additional_tools=None, streaming=False):
         """Initialize with base tools and optional additional tools."""
-        self.llm = config.get_llm()
+        self.streaming = streaming
         self.base_tools = available_tools.copy()
         if additional_tools:
             self.base_tools.extend(additional_tools)
 
-    def product_competitor_agent(self):
+    def llm_for(self, stage):
+        """The LLM routed to a pipeline stage (model tier, output cap and temperature)."""
+        return config.get_llm(streaming=self.streaming, route=model_router.route(stage))
+
+    def product_competitor_agent(self, stage="product_analysis"):
         return Agent(
             role="Lead Market Analyst",
             goal=dedent("""\
@@ -25,14 +31,17 @@ class InstaContentFactory:
                 digital marketing firm, you specialize in dissecting
                 online business landscapes."""),
             tools=[
+                KnowledgeTools.search_knowledge,
                 BrowserTools.scrape_and_summarize_website,
-                SearchTools.search_internet
+                BrowserTools.scrape_many_websites,
+                SearchTools.search_internet,
+                SearchTools.search_internet_many
             ],
             allow_delegation=False,
-            llm=self.llm,
-            verbose=True,
-            max_iter=3,
-            step_callback=lambda step: print(f"Agent step: {step}")
+            llm=self.llm_for(stage),
+            verbose=config.verbose,
+            max_iter=iteration_controller.max_budget,
+            step_callback=iteration_controller.step_callback
         )
 
     def strategy_planner_agent(self):
@@ -46,14 +55,17 @@ class InstaContentFactory:
                 a leading digital marketing agency, known for crafting
                 bespoke strategies that drive success."""),
             tools=[
+                KnowledgeTools.search_knowledge,
                 BrowserTools.scrape_and_summarize_website,
+                BrowserTools.scrape_many_websites,
                 SearchTools.search_internet,
+                SearchTools.search_internet_many,
                 SearchTools.search_instagram
             ],
-            llm=self.llm,
-            verbose=True,
-            max_iter=3,
-            step_callback=lambda step: print(f"Agent step: {step}")
+            llm=self.llm_for("campaign_development"),
+            verbose=config.verbose,
+            max_iter=iteration_controller.max_budget,
+            step_callback=iteration_controller.step_callback
         )
 
     def creative_content_creator_agent(self):
@@ -75,10 +87,10 @@ class InstaContentFactory:
                 SearchTools.search_internet,
                 SearchTools.search_instagram
             ],
-            llm=self.llm,
-            verbose=True,
-            max_iter=3,
-            step_callback=lambda step: print(f"Agent step: {step}")
+            llm=self.llm_for("ad_copy"),
+            verbose=config.verbose,
+            max_iter=iteration_controller.max_budget,
+            step_callback=iteration_controller.step_callback
         )
 
     def senior_photographer_agent(self):
@@ -97,9 +109,11 @@ class InstaContentFactory:
                 SearchTools.search_internet,
                 SearchTools.search_instagram
             ],
-            llm=self.llm,
+            llm=self.llm_for("photo"),
             allow_delegation=False,
-            verbose=True
+            verbose=config.verbose,
+            max_iter=iteration_controller.max_budget,
+            step_callback=iteration_controller.step_callback
         )
 
     def chief_creative_director_agent(self):
@@ -120,8 +134,10 @@ class InstaContentFactory:
                 SearchTools.search_internet,
                 SearchTools.search_instagram
             ],
-            llm=self.llm,
-            verbose=True
+            llm=self.llm_for("image"),
+            verbose=config.verbose,
+            max_iter=iteration_controller.max_budget,
+            step_callback=iteration_controller.step_callback
         )
 
 
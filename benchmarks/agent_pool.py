@@ -0,0 +1,86 @@
+"""
+Per-request setup overhead with and without the agent pool.
+
+Builds the six agents and six tasks a single ideation run needs, either from
+a fresh InstaContentFactory (the old per-request path) or by leasing agents
+from a prebuilt AgentPool. No LLM calls are made.
+
+Usage:
+    python benchmarks/agent_pool.py [--requests 50]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Building clients needs a key but never sends a request here
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from agents import InstaContentFactory  # noqa: E402
+from agent_pool import AgentPool  # noqa: E402
+from tasks import MarketingAnalysisTasks  # noqa: E402
+
+WEBSITE = "https://example.com"
+DETAILS = "Benchmark product"
+
+
+def bind_tasks(tasks, agents):
+    """Create every agent and task one run uses, mirroring build_ideation_graph."""
+    analyst = agents.product_competitor_agent()
+    competitor_analyst = agents.product_competitor_agent("competitor_analysis")
+    planner = agents.strategy_planner_agent()
+    creative = agents.creative_content_creator_agent()
+    photographer = agents.senior_photographer_agent()
+    director = agents.chief_creative_director_agent()
+    tasks.product_analysis(analyst, WEBSITE, DETAILS)
+    tasks.competitor_analysis(competitor_analyst, WEBSITE, DETAILS)
+    tasks.campaign_development(planner, WEBSITE, DETAILS, handoff="- fact")
+    tasks.instagram_ad_copy(creative, handoff="- idea")
+    tasks.take_photograph_task(photographer, "Option 1: copy", WEBSITE, DETAILS)
+    tasks.review_photo(director, WEBSITE, DETAILS, handoff="- photo")
+
+
+def without_pool(tasks, n):
+    timings = []
+    for _ in range(n):
+        started = time.perf_counter()
+        bind_tasks(tasks, InstaContentFactory())
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def with_pool(tasks, n):
+    started = time.perf_counter()
+    pool = AgentPool(InstaContentFactory(), size=1)
+    startup = time.perf_counter() - started
+    timings = []
+    for _ in range(n):
+        started = time.perf_counter()
+        with pool.lease() as agents:
+            bind_tasks(tasks, agents)
+        timings.append(time.perf_counter() - started)
+    return startup, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    tasks = MarketingAnalysisTasks()
+    baseline = without_pool(tasks, args.requests)
+    startup, pooled = with_pool(tasks, args.requests)
+
+    print(f"{'mode':<14} {'median/request':>15} {'p95/request':>12}")
+    for name, timings in (("no pool", baseline), ("agent pool", pooled)):
+        p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+        print(f"{name:<14} {statistics.median(timings) * 1000:12.2f} ms {p95 * 1000:9.2f} ms")
+    print(f"pool startup (one time): {startup * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
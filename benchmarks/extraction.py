@@ -0,0 +1,74 @@
+"""
+Scrape extraction benchmark.
+
+Runs the legacy prefix-filter extraction and the streaming extractor over
+saved Serper scrape responses in benchmarks/corpus and reports extraction
+time, how much of the response was read, whether reading stopped early once
+the budget was filled, recall of annotated key facts and leakage of
+annotated boilerplate. emberline_stove is several times the default budget,
+so it shows the early stop.
+
+Usage:
+    python benchmarks/extraction.py [--budget 3000] [--repeat 200]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from extractor import extract_from_stream  # noqa: E402
+
+CORPUS = os.path.join(ROOT, "benchmarks", "corpus")
+
+
+def legacy_extract(raw, budget):
+    """The original tools.py behaviour: parse everything, cut to the budget, filter by prefix."""
+    content = json.loads(raw).get('text', '')[:budget]
+    lines = [line.strip() for line in content.split('\n')]
+    kept = [line for line in lines if len(line) > 20 and not line.startswith(('Cookie', 'Privacy', 'Terms', 'Copyright'))]
+    return '\n'.join(kept[:50]), len(raw), False
+
+
+def streaming_extract(raw, budget):
+    chunks = (raw[i:i + 4096] for i in range(0, len(raw), 4096))
+    content, stats = extract_from_stream(chunks, budget_chars=budget)
+    return content, stats["chars_read"], stats["stopped_early"]
+
+
+def quality(content, annotation):
+    lowered = content.lower()
+    found = sum(phrase.lower() in lowered for phrase in annotation["expected"])
+    leaked = sum(phrase.lower() in lowered for phrase in annotation["boilerplate"])
+    return found / len(annotation["expected"]), leaked / len(annotation["boilerplate"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(os.path.join(CORPUS, "annotations.json"), encoding="utf-8") as f:
+        annotations = json.load(f)
+
+    print(f"{'page':<20} {'method':<10} {'time/page':>10} {'size':>7} {'read':>7} {'early':>5} {'kept':>6} "
+          f"{'recall':>7} {'leak':>6}")
+    for name, annotation in sorted(annotations.items()):
+        with open(os.path.join(CORPUS, f"{name}.json"), encoding="utf-8") as f:
+            raw = f.read()
+        for method, fn in (("legacy", legacy_extract), ("streaming", streaming_extract)):
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                content, read, early = fn(raw, args.budget)
+            elapsed = (time.perf_counter() - started) / args.repeat
+            recall, leak = quality(content, annotation)
+            print(f"{name:<20} {method:<10} {elapsed * 1e6:8.0f}us {len(raw):>7} {read:>7} {'yes' if early else 'no':>5} "
+                  f"{len(content):>6} {recall:>7.0%} {leak:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Offline check and benchmark of the LLM response cache.
+
+Sends each prompt twice through a replayed chat model with a fresh
+llm_cache.PromptCache, the way crewai calls it (`stream()` on a model bound
+to stop words), and reports the time per miss and per hit and the cache's
+counters. A near-duplicate round (the prompt with its product details
+changed) is matched when --near-threshold is set. Exits with an error when a
+repeated prompt is not served from the cache.
+
+Usage:
+    python benchmarks/llm_cache.py --prompts 20 --llm-latency 0.2 --near-threshold 0.8
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["REPLAY_MODE"] = "replay"
+os.environ.setdefault("REPLAY_DIR", tempfile.mkdtemp())
+
+from cache import ResultCache  # noqa: E402
+from llm_cache import PromptCache  # noqa: E402
+from replay import ReplayChatModel, replay  # noqa: E402
+
+PROMPT = (
+    "You are a Lead Market Analyst. Analyze the product at https://product-{n}.example "
+    "and report its key facts, unique selling points and audience. Product details: {details}. "
+    "Use the tools available to you and end with Final Answer."
+)
+DETAILS = (
+    "a reusable bottle that keeps drinks cold for a day",
+    "noise cancelling headphones with a forty hour battery",
+    "a cast iron pan that comes seasoned and ready to cook",
+    "running shoes with a recycled foam sole and wide fit",
+)
+
+
+def run(llm, prompts):
+    """Stream every prompt to the end and return the seconds per prompt."""
+    started = time.perf_counter()
+    for prompt in prompts:
+        for _ in llm.bind(stop=["\nObservation"]).stream(prompt):
+            pass
+    return (time.perf_counter() - started) / len(prompts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per replayed LLM call")
+    parser.add_argument("--near-threshold", type=float, default=None,
+                        help="Also match near-duplicate prompts at this MinHash similarity")
+    args = parser.parse_args()
+
+    replay.llm_latency = args.llm_latency
+    replay.llm_fallback = lambda prompt: "Thought: I now know the final answer\nFinal Answer: A cached answer."
+    store = ResultCache(path=os.path.join(tempfile.mkdtemp(), "llm_cache.sqlite3"))
+    prompt_cache = PromptCache(store, near_threshold=args.near_threshold)
+    llm = ReplayChatModel(streaming=True, cache=prompt_cache)
+
+    prompts = [PROMPT.format(n=n, details=f"{DETAILS[n % len(DETAILS)]}, model {n}") for n in range(args.prompts)]
+    rounds = [("miss", prompts), ("repeat", prompts)]
+    if args.near_threshold:
+        rounds.append(("near", [prompt.replace("Product details:", "Product details (updated):") for prompt in prompts]))
+
+    print(f"{'round':<7} {'ms/prompt':>9} {'exact':>6} {'near':>5} {'miss':>5}")
+    hits = {}
+    for name, round_prompts in rounds:
+        before = prompt_cache.stats()
+        per_prompt = run(llm, round_prompts)
+        after = prompt_cache.stats()
+        exact, near, misses = (after[key] - before[key] for key in ("exact_hits", "near_hits", "misses"))
+        hits[name] = exact + near
+        print(f"{name:<7} {per_prompt * 1000:9.1f} {exact:>6} {near:>5} {misses:>5}")
+
+    if hits["repeat"] < args.prompts:
+        sys.exit(f"Only {hits['repeat']} of {args.prompts} repeated prompts were served from the cache")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Load test for the HTTP service with stubbed LLM and Serper backends.
+
+Starts service.py in-process with a stub pipeline that has the same task
+graph as crew.py, where every LLM call and Serper request is replaced by a
+sleep of the configured latency. Submits jobs concurrently, polls until all
+finish and reports throughput and p50/p99 job latency per worker count.
+
+Usage:
+    python benchmarks/load_test.py --jobs 40 --workers 1 2 4 8 --llm-latency 0.2 --serper-latency 0.05
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiohttp import ClientSession, web  # noqa: E402
+
+from scheduler import TaskGraph  # noqa: E402
+from service import create_app  # noqa: E402
+
+
+def stub_runner(llm_latency, serper_latency, llm_calls_per_task=2, tool_calls_per_task=2):
+    """Pipeline stand-in: same DAG as build_ideation_graph, sleeps instead of network calls."""
+
+    def task(tool_calls=tool_calls_per_task):
+        def run(**_):
+            for _ in range(tool_calls):
+                time.sleep(serper_latency)
+            for _ in range(llm_calls_per_task):
+                time.sleep(llm_latency)
+            return "stub output"
+        return run
+
+    def run(product_website, product_details):
+        graph = TaskGraph()
+        graph.add("product_analysis", task())
+        graph.add("competitor_analysis", task())
+        graph.add("campaign_development", task(), needs=("product_analysis", "competitor_analysis"))
+        graph.add("ad_copy", task(tool_calls=0), needs=("campaign_development",))
+        graph.add("photo", task(tool_calls=0), needs=("ad_copy",))
+        graph.add("image", task(tool_calls=0), needs=("photo",))
+        results = graph.run()
+        return {"ad_copy": results["ad_copy"], "image": results["image"]}
+
+    return run
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_load(port, jobs):
+    base = f"http://127.0.0.1:{port}"
+    latencies = []
+    rejected = 0
+    async with ClientSession() as session:
+        async def one(i):
+            nonlocal rejected
+            submitted = time.perf_counter()
+            while True:
+                async with session.post(f"{base}/jobs", json={
+                    "product_website": f"https://product-{i}.example",
+                    "product_details": "load test",
+                }) as response:
+                    if response.status == 429:
+                        rejected += 1
+                        await asyncio.sleep(float(response.headers.get("Retry-After", "1")) / 10)
+                        continue
+                    job_id = (await response.json())["id"]
+                    break
+            while True:
+                async with session.get(f"{base}/jobs/{job_id}") as response:
+                    if (await response.json())["status"] in ("done", "failed"):
+                        break
+                await asyncio.sleep(0.02)
+            latencies.append(time.perf_counter() - submitted)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(jobs)))
+        elapsed = time.perf_counter() - started
+    return elapsed, latencies, rejected
+
+
+async def bench(workers, args):
+    app = create_app(
+        runner=stub_runner(args.llm_latency, args.serper_latency),
+        workers=workers, queue_size=args.queue_size,
+    )
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        return await run_load(port, args.jobs)
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queue-size", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per stubbed LLM call")
+    parser.add_argument("--serper-latency", type=float, default=0.05, help="Seconds per stubbed Serper call")
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'jobs/s':>8} {'p50':>8} {'p99':>8} {'429s':>6}")
+    for workers in args.workers:
+        elapsed, latencies, rejected = asyncio.run(bench(workers, args))
+        print(
+            f"{workers:>7} {len(latencies) / elapsed:8.2f} "
+            f"{statistics.median(latencies):7.2f}s {percentile(latencies, 99):7.2f}s {rejected:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
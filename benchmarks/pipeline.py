@@ -0,0 +1,188 @@
+"""
+Offline benchmark of the full ideation pipeline.
+
+Runs crew.run_ideation (both analysis crews, campaign, copy and image
+stages) with every Gemini and Serper call served by replay.py. Recorded
+fixtures in --fixtures are used when present; any request without one gets a
+synthetic answer so the benchmark runs on a machine with no network or keys.
+Each call sleeps for the configured fake latency. Reports throughput,
+p50/p99 product latency, how much of the run was spent in (fake) model
+and tool calls versus orchestration, and how many tool calls were served
+from prefetch, per concurrency level. Set PREFETCH=0 to compare without it.
+
+Run with --llm-latency 0 --serper-latency 0 to measure pure orchestration
+overhead. Record real fixtures with:
+    REPLAY_MODE=record REPLAY_DIR=benchmarks/fixtures python crew.py --batch products.jsonl
+
+Usage:
+    python benchmarks/pipeline.py --products 8 --concurrency 1 2 4 --llm-latency 0.2 --serper-latency 0.05
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Offline, unthrottled and uncached so every round does the same work
+os.environ["REPLAY_MODE"] = "replay"
+os.environ.setdefault("REPLAY_DIR", os.path.join(ROOT, "benchmarks", "fixtures"))
+os.environ.setdefault("GEMINI_RPM", "0")
+os.environ.setdefault("GEMINI_TPM", "0")
+os.environ.setdefault("SERPER_RPM", "0")
+os.environ.setdefault("LLM_CACHE", "0")
+os.environ.setdefault("CHECKPOINTS", "0")
+os.environ.setdefault("KNOWLEDGE", "0")
+os.environ.setdefault("CREW_VERBOSE", "0")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("TOOL_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "tool_cache.sqlite3"))
+
+from agent_pool import AgentPool  # noqa: E402
+from agents import InstaContentFactory  # noqa: E402
+from cache import tool_cache  # noqa: E402
+from crew import run_ideation  # noqa: E402
+from prefetch import prefetcher  # noqa: E402
+from replay import replay  # noqa: E402
+from tasks import MarketingAnalysisTasks  # noqa: E402
+from tracing import tracer  # noqa: E402
+
+SUMMARY_KEYS = re.compile(r'with the keys ((?:"\w+"(?:, )?)+)')
+URL = re.compile(r'https?://[^\s"\'<>)]+')
+
+
+def synthetic_llm(prompt):
+    """A plausible ReAct answer: one tool call per task, then a final answer in the requested shape."""
+    if "Action Input:" in prompt and prompt.count("Observation:") <= 1:
+        urls = URL.findall(prompt)
+        if "Scrape website content" in prompt and urls:
+            return f'Thought: I should read the product page.\nAction: Scrape website content\nAction Input: {{"website": "{urls[0]}"}}'
+        if "Search internet" in prompt:
+            return 'Thought: I should research the market.\nAction: Search internet\nAction Input: {"query": "best products in this category"}'
+
+    lines = ["Thought: I now know the final answer", "Final Answer: Here is my work."]
+    if "Option N:" in prompt:
+        for n in range(1, 4):
+            lines.append(f"Option {n}: A short, punchy synthetic option number {n} for the campaign.")
+    else:
+        lines.append("The product stands out on quality, price and convenience for its audience.")
+    match = SUMMARY_KEYS.search(prompt)
+    if match:
+        keys = re.findall(r'"(\w+)"', match.group(1))
+        summary = {key: [f"synthetic {key} item {n}" for n in range(1, 4)] for key in keys}
+        lines.append("```json\n" + json.dumps(summary) + "\n```")
+    return '\n'.join(lines)
+
+
+def synthetic_serper(url, payload):
+    """A Serper-shaped response: organic results for searches, page text for scrapes."""
+    if "scrape" in url:
+        paragraph = (
+            "Our product is built for people who want quality without compromise. "
+            "It ships free, comes with a two-year warranty and is made from recycled materials."
+        )
+        return {"text": '\n'.join([paragraph] * 20), "metadata": {"title": payload.get("url", "")}}
+    query = payload.get("q", "")
+    return {"organic": [
+        {"title": f"Result {n} for {query}", "link": f"https://example.com/{n}", "snippet": f"Snippet {n} about {query}."}
+        for n in range(1, 6)
+    ]}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_round(tasks, products, concurrency):
+    """Run every product at the given concurrency.
+
+    Returns elapsed seconds, latencies, failures and the tool calls served from prefetch.
+    """
+    tracer.reset()
+    tool_cache.clear()
+    if prefetcher is not None:
+        prefetcher.clear()
+    agent_pool = AgentPool(InstaContentFactory(), size=concurrency)
+
+    def one(product):
+        started = time.perf_counter()
+        with agent_pool.lease() as agents:
+            result = run_ideation(tasks, agents, product["product_website"], product["product_details"])
+        return time.perf_counter() - started, result["prefetch_stats"]
+
+    latencies, failures, prefetched = [], 0, 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(one, product) for product in products]:
+            try:
+                latency, prefetch = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"  failed: {e}", file=sys.stderr)
+                continue
+            latencies.append(latency)
+            prefetched += prefetch["served"] if prefetch else 0
+    return time.perf_counter() - started, latencies, failures, prefetched
+
+
+def external_share():
+    """Fraction of task time spent inside LLM and tool spans."""
+    aggregates = dict(tracer.aggregates)
+    task_time = sum(agg["duration_s"] for (kind, _), agg in aggregates.items() if kind == "task")
+    external = sum(agg["duration_s"] for (kind, _), agg in aggregates.items() if kind in ("llm", "tool"))
+    calls = {kind: sum(agg["count"] for (k, _), agg in aggregates.items() if k == kind) for kind in ("llm", "tool")}
+    return (external / task_time if task_time else 0.0), calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per replayed LLM call")
+    parser.add_argument("--serper-latency", type=float, default=0.05, help="Seconds per replayed Serper call")
+    parser.add_argument("--strict", action="store_true", help="Fail on requests without a recorded fixture")
+    parser.add_argument("--profile", action="store_true", help="Print the span summary of the last round")
+    args = parser.parse_args()
+
+    replay.llm_latency = args.llm_latency
+    replay.serper_latency = args.serper_latency
+    if not args.strict:
+        replay.llm_fallback = synthetic_llm
+        replay.serper_fallback = synthetic_serper
+    print(f"Fixtures: {replay.stats()}")
+
+    tasks = MarketingAnalysisTasks()
+    products = [
+        {"product_website": f"https://product-{i}.example", "product_details": f"Benchmark product {i}"}
+        for i in range(args.products)
+    ]
+
+    print(f"{'conc':>4} {'products/s':>10} {'p50':>8} {'p99':>8} {'llm':>5} {'tools':>5} {'prefetch':>8} "
+          f"{'external':>8} {'failed':>6}")
+    for concurrency in args.concurrency:
+        elapsed, latencies, failures, prefetched = run_round(tasks, products, concurrency)
+        share, calls = external_share()
+        if not latencies:
+            print(f"{concurrency:>4} {'-':>10} {'-':>8} {'-':>8} {calls['llm']:>5} {calls['tool']:>5} {prefetched:>8} "
+                  f"{'-':>8} {failures:>6}")
+            continue
+        print(
+            f"{concurrency:>4} {len(latencies) / elapsed:10.2f} {statistics.median(latencies):7.2f}s "
+            f"{percentile(latencies, 99):7.2f}s {calls['llm']:>5} {calls['tool']:>5} {prefetched:>8} "
+            f"{share:8.0%} {failures:>6}"
+        )
+
+    if args.profile:
+        print()
+        print(tracer.summary_table())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Offline benchmark of per-task model routing.
+
+Runs a stubbed ideation pipeline (the six stages, each a few LLM calls of a
+typical prompt and answer size) through routing.FallbackChatModel and
+rate_limiter.PooledChatModel, with every tier's model replaced by a stub
+that sleeps like that tier (time to first token plus time per output token)
+and truncates answers at the route's output cap. Compares routing
+configurations and reports, per configuration, product latency, input and
+output tokens, estimated cost, calls per tier, fallbacks to another tier and
+answers cut short by the output cap.
+
+Configurations:
+    legacy   every stage on the single flash route used before routing
+    routed   routing.DEFAULT_ROUTES
+    lite     every stage on the lite tier, with the routed output caps
+    custom   --routes, in MODEL_ROUTES syntax, over the default routes
+
+Sleeps are scaled by --time-scale so a run takes seconds; latencies and the
+--*-rpm limits are reported in unscaled (simulated) time. Lower --flash-rpm
+to see calls fall back to another tier instead of queueing.
+
+Usage:
+    python benchmarks/routing.py --products 8 --concurrency 4 --flash-rpm 15
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+
+from rate_limiter import KeyPool, PooledChatModel, TokenBucket  # noqa: E402
+from routing import ModelRouter, FallbackChatModel, Route, DEFAULT_ROUTE, DEFAULT_ROUTES, parse_routes  # noqa: E402
+
+# Stage, LLM calls per product, prompt tokens per call, output tokens the stage wants per call
+STAGES = (
+    ("product_analysis", 4, 2600, 450),
+    ("competitor_analysis", 4, 2800, 500),
+    ("campaign_development", 3, 3200, 900),
+    ("ad_copy", 2, 2200, 400),
+    ("photo", 2, 1800, 350),
+    ("image", 2, 2000, 300),
+)
+# Simulated seconds to first token, seconds per output token
+TIER_LATENCY = {
+    "pro": (1.0, 0.012),
+    "flash": (0.35, 0.004),
+    "lite": (0.25, 0.0025),
+}
+# Approximate list prices in USD per million input and output tokens
+TIER_PRICE = {
+    "pro": (1.25, 5.00),
+    "flash": (0.10, 0.40),
+    "lite": (0.075, 0.30),
+}
+WANT = re.compile(r'^\[(\w+) wants (\d+) tokens\]')
+
+
+class Meter:
+    """Token use per tier and truncated answers of one configuration."""
+
+    def __init__(self):
+        self.tokens = {}
+        self.truncated = 0
+        self._lock = threading.Lock()
+
+    def record(self, tier, prompt_tokens, output_tokens, truncated):
+        with self._lock:
+            used = self.tokens.setdefault(tier, [0, 0])
+            used[0] += prompt_tokens
+            used[1] += output_tokens
+            self.truncated += truncated
+
+    def cost(self):
+        return sum(
+            (used[0] * TIER_PRICE[tier][0] + used[1] * TIER_PRICE[tier][1]) / 1e6
+            for tier, used in self.tokens.items()
+        )
+
+
+class StubTierModel(BaseChatModel):
+    """A tier's model: sleeps like the tier and answers with as many tokens as the stage wants, up to the cap."""
+
+    tier: str
+    max_output_tokens: int
+    time_scale: float
+    meter: Any
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self):
+        return "stub-tier"
+
+    @property
+    def _identifying_params(self):
+        return {"tier": self.tier, "max_output_tokens": self.max_output_tokens}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = str(messages[-1].content)
+        wanted = int(WANT.match(prompt).group(2))
+        output_tokens = min(wanted, self.max_output_tokens)
+        prompt_tokens = len(prompt) // 4
+        first_token, per_token = TIER_LATENCY[self.tier]
+        time.sleep((first_token + per_token * output_tokens) * self.time_scale)
+        self.meter.record(self.tier, prompt_tokens, output_tokens, wanted > output_tokens)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": output_tokens,
+                 "total_tokens": prompt_tokens + output_tokens}
+        message = AIMessage(content="word " * output_tokens)
+        return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"token_usage": usage})
+
+
+def build_stage_models(routes, fallbacks, rpms, time_scale, max_wait, meter):
+    """One FallbackChatModel per stage, over fresh per-tier key pools shared by all stages."""
+    pools = {tier: KeyPool(tier, ["benchmark-key"], rpm=0) for tier in rpms}
+    for tier, rpm in rpms.items():
+        if rpm:
+            # Refill per simulated minute, but keep the burst at one simulated minute's requests
+            for key in pools[tier].keys:
+                key.limiter.requests = TokenBucket(rpm / time_scale, capacity=rpm)
+    router = ModelRouter(routes, fallbacks=fallbacks, max_wait=max_wait * time_scale)
+    models = {}
+    for stage, *_ in STAGES:
+        route = router.route(stage)
+        models[stage] = FallbackChatModel(
+            tiers=[
+                (tier, PooledChatModel(
+                    clients=[StubTierModel(tier=tier, max_output_tokens=route.max_output_tokens,
+                                           time_scale=time_scale, meter=meter)],
+                    pool=pools[tier],
+                    max_output_tokens=route.max_output_tokens,
+                ))
+                for tier in router.chain(route.tier)
+            ],
+            max_wait=router.max_wait,
+            router=router,
+        )
+    return models, router
+
+
+def run_product(models, time_scale):
+    started = time.perf_counter()
+    for stage, calls, prompt_tokens, wanted in STAGES:
+        prompt = f"[{stage} wants {wanted} tokens] " + "context " * (prompt_tokens * 4 // 8)
+        for _ in range(calls):
+            models[stage].invoke(prompt)
+    return (time.perf_counter() - started) / time_scale
+
+
+def run_config(name, routes, fallbacks, args):
+    meter = Meter()
+    rpms = {"pro": args.pro_rpm, "flash": args.flash_rpm, "lite": args.lite_rpm}
+    models, router = build_stage_models(routes, fallbacks, rpms, args.time_scale, args.max_wait, meter)
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = sorted(pool.map(lambda _: run_product(models, args.time_scale), range(args.products)))
+    stats = router.stats()
+    return {
+        "name": name,
+        "p50_s": statistics.median(latencies),
+        "max_s": latencies[-1],
+        "input": sum(used[0] for used in meter.tokens.values()) / args.products,
+        "output": sum(used[1] for used in meter.tokens.values()) / args.products,
+        "cost": meter.cost() / args.products,
+        "served": stats["served"],
+        "fallbacks": stats["fallbacks"],
+        "truncated": meter.truncated,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4, help="Products at once")
+    parser.add_argument("--pro-rpm", type=int, default=2, help="Simulated pro requests per minute (0 = unlimited)")
+    parser.add_argument("--flash-rpm", type=int, default=15, help="Simulated flash requests per minute (0 = unlimited)")
+    parser.add_argument("--lite-rpm", type=int, default=30, help="Simulated lite requests per minute (0 = unlimited)")
+    parser.add_argument("--max-wait", type=float, default=2.0,
+                        help="Simulated seconds a tier may make a call wait before the next tier is tried first")
+    parser.add_argument("--routes", default="", help='Custom routes, e.g. "ad_copy=lite:1024:0.5,image=lite:512:0.2"')
+    parser.add_argument("--time-scale", type=float, default=0.02, help="Real seconds per simulated second")
+    args = parser.parse_args()
+
+    configs = [
+        # Before routing there was one model and no other tier to fall back to
+        ("legacy", {}, {}),
+        ("routed", DEFAULT_ROUTES, None),
+        ("lite", {stage: Route("lite", DEFAULT_ROUTES.get(stage, DEFAULT_ROUTE).max_output_tokens,
+                               DEFAULT_ROUTES.get(stage, DEFAULT_ROUTE).temperature)
+                  for stage, *_ in STAGES}, None),
+    ]
+    if args.routes:
+        configs.append(("custom", {**DEFAULT_ROUTES, **parse_routes(args.routes)}, None))
+
+    rows = [run_config(name, routes, fallbacks, args) for name, routes, fallbacks in configs]
+    print(f"\n{'config':<8} {'p50':>7} {'max':>7} {'in/prod':>8} {'out/prod':>8} {'$/1k prod':>9} "
+          f"{'fallback':>8} {'cut':>4}  calls per tier")
+    for row in rows:
+        served = ', '.join(f"{tier} {count}" for tier, count in sorted(row["served"].items()))
+        print(f"{row['name']:<8} {row['p50_s']:6.1f}s {row['max_s']:6.1f}s {row['input']:>8.0f} {row['output']:>8.0f} "
+              f"{row['cost'] * 1000:>9.2f} {row['fallbacks']:>8} {row['truncated']:>4}  {served}")
+
+    legacy = rows[0]
+    for row in rows[1:]:
+        if legacy["p50_s"] and legacy["cost"]:
+            print(f"{row['name']}: p50 latency {row['p50_s'] / legacy['p50_s']:.0%} and cost "
+                  f"{row['cost'] / legacy['cost']:.0%} of legacy")
+
+
+if __name__ == "__main__":
+    main()
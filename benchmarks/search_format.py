@@ -0,0 +1,96 @@
+"""
+Search result formatting benchmark.
+
+Replays the saved Serper search responses in benchmarks/serper, one file
+per agent task in call order, through the original verbose
+"Title:/Link:/Snippet:" format and the compact format in search_format.py,
+and reports tokens per tool call, and how many of the distinct result pages
+each format still shows the agent across the task.
+
+Usage:
+    python benchmarks/search_format.py [--budget 350] [--n-results 5]
+"""
+import os
+import sys
+import json
+import glob
+import argparse
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from handoff import count_tokens  # noqa: E402
+from iteration import IterationController  # noqa: E402
+from search_format import format_results, short_url  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "serper")
+
+
+def legacy_format(results):
+    """The original SearchTools._search output."""
+    content = '\n'.join(
+        '\n'.join([
+            f"Title: {result.get('title', 'N/A')}",
+            f"Link: {result.get('link', 'N/A')}",
+            f"Snippet: {result.get('snippet', 'N/A')}",
+            "\n-----------------"
+        ])
+        for result in results
+    )
+    return f"\nSearch result: {content}\n"
+
+
+def run_task(calls, fmt, n_results):
+    """Format every call of one task in order; returns tokens per call and the pages shown."""
+    tokens, shown = [], set()
+    controller = IterationController()
+    with controller.task("competitor_analysis", SimpleNamespace()):
+        for call in calls:
+            results = call["response"].get("organic", [])[:n_results]
+            output = fmt(results)
+            tokens.append(count_tokens(output))
+            shown.update(
+                short_url(r.get("link", "")) for r in results
+                if r.get("link", "") in output or short_url(r.get("link", "")) in output
+            )
+    return tokens, shown
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=350, help="Token budget per compact call")
+    parser.add_argument("--n-results", type=int, default=5)
+    args = parser.parse_args()
+
+    formats = (
+        ("legacy", legacy_format),
+        ("compact", lambda results: format_results(results, budget=args.budget)),
+    )
+    totals = {name: [] for name, _ in formats}
+    print(f"{'task':<20} {'format':<8} {'calls':>5} {'tokens/call':>11} {'total':>6} {'pages':>6}")
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.json"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, encoding="utf-8") as f:
+            calls = json.load(f)
+        pages = {
+            short_url(r.get("link", ""))
+            for call in calls for r in call["response"].get("organic", [])[:args.n_results]
+        }
+        for fmt_name, fmt in formats:
+            tokens, shown = run_task(calls, fmt, args.n_results)
+            totals[fmt_name].extend(tokens)
+            print(
+                f"{name:<20} {fmt_name:<8} {len(tokens):>5} {sum(tokens) / len(tokens):>11.0f} "
+                f"{sum(tokens):>6} {len(shown)}/{len(pages):<4}"
+            )
+
+    legacy, compact = sum(totals["legacy"]), sum(totals["compact"])
+    if legacy:
+        print(f"\nCompact output uses {compact / legacy:.0%} of the legacy tokens "
+              f"({sum(totals['legacy']) / len(totals['legacy']):.0f} -> "
+              f"{sum(totals['compact']) / len(totals['compact']):.0f} tokens per call)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Scaling benchmark of the multi-process sharded batch runner.
+
+Runs the same catalog through sharding.run_sharded with 1, 2, ... N worker
+processes against the stubbed backends of benchmarks/pipeline.py (replayed
+or synthetic Gemini and Serper answers with a fake latency), and reports
+throughput, speedup over one process, and whether the merged output is
+identical across process counts. Every round starts with empty tool caches
+and a fresh shared rate-limit file.
+
+Use --llm-latency 0 --serper-latency 0 to measure how far the orchestration
+CPU work alone scales, and --rpm to see the shared Gemini budget cap the
+throughput no matter how many processes run.
+
+Usage:
+    python benchmarks/sharding.py --products 32 --processes 1 2 4 --concurrency 4
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import functools
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Sets up the offline, uncached environment the workers inherit
+from benchmarks.pipeline import synthetic_llm, synthetic_serper  # noqa: E402
+from sharding import run_sharded  # noqa: E402
+
+
+def configure_worker(llm_latency, serper_latency):
+    """Install the stub backends in a worker process."""
+    from rate_limiter import limiter
+    from replay import replay
+
+    gemini = limiter.get("gemini")
+
+    def llm(prompt):
+        # Replayed calls never reach the pooled client, so take the shared budget here
+        gemini.acquire()
+        return synthetic_llm(prompt)
+
+    replay.llm_latency = llm_latency
+    replay.serper_latency = serper_latency
+    replay.llm_fallback = llm
+    replay.serper_fallback = synthetic_serper
+
+
+def digest(output_path):
+    """Hash of the merged output's keys, statuses and answers, ignoring timings."""
+    material = []
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            material.append([record["key"], record["status"], record.get("ad_copy"), record.get("image")])
+    return hashlib.sha256(json.dumps(material).encode('utf-8')).hexdigest()[:12]
+
+
+def run_round(input_path, processes, concurrency, initializer):
+    directory = tempfile.mkdtemp(prefix="sharding-bench-")
+    os.environ["TOOL_CACHE_PATH"] = os.path.join(directory, "tool_cache.sqlite3")
+    os.environ["RATE_LIMIT_SHARED_PATH"] = os.path.join(directory, "rate_limits.sqlite3")
+    output_path = os.path.join(directory, "results.jsonl")
+    started = time.perf_counter()
+    result = run_sharded(input_path, output_path, processes, concurrency, initializer=initializer)
+    return time.perf_counter() - started, result, digest(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=32)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=4, help="Products at once per process")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per stubbed LLM call")
+    parser.add_argument("--serper-latency", type=float, default=0.02, help="Seconds per stubbed Serper call")
+    parser.add_argument("--rpm", type=int, default=0, help="Shared Gemini requests per minute (0 = unlimited)")
+    args = parser.parse_args()
+
+    os.environ["GEMINI_RPM"] = str(args.rpm)
+    # A key is needed for the shared budget to have something to limit
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+    initializer = functools.partial(configure_worker, args.llm_latency, args.serper_latency)
+
+    input_path = os.path.join(tempfile.mkdtemp(prefix="sharding-bench-"), "products.jsonl")
+    with open(input_path, 'w', encoding='utf-8') as f:
+        for i in range(args.products):
+            f.write(json.dumps({"product_website": f"https://product-{i}.example", "product_details": f"Product {i}"}) + '\n')
+
+    rows, baseline = [], None
+    for processes in args.processes:
+        elapsed, result, output_digest = run_round(input_path, processes, args.concurrency, initializer)
+        throughput = result["ok"] / elapsed if elapsed else 0.0
+        baseline = baseline or throughput
+        rows.append((processes, throughput, throughput / baseline if baseline else 0.0,
+                     result["ok"], result["error"], result["merge_s"], output_digest))
+
+    print(f"\n{'procs':>5} {'products/s':>10} {'speedup':>8} {'ok':>5} {'failed':>6} {'merge':>7} {'output':>12}")
+    for processes, throughput, speedup, ok, failed, merge_s, output_digest in rows:
+        print(f"{processes:>5} {throughput:10.2f} {speedup:7.2f}x {ok:>5} {failed:>6} {merge_s:6.3f}s {output_digest:>12}")
+    identical = len({row[-1] for row in rows}) == 1
+    print(f"\nMerged output identical across process counts: {'yes' if identical else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Startup-time benchmark.
+
+Measures cold import time of crewai, tools and agents (each in a fresh
+interpreter), the cost of building an InstaContentFactory, and, when a
+GOOGLE_API_KEY is available, the latency of the first task.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--first-task]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def time_import(module, runs):
+    """Import a module in fresh interpreters and return the timings in seconds."""
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def time_factory(runs):
+    """Time building InstaContentFactory and its five agents in this process."""
+    from agents import create_ideation_team
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        create_ideation_team()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def time_first_task():
+    """Time from a cold factory to the answer of a trivial one-task crew."""
+    from crewai import Crew, Task
+    from agents import InstaContentFactory
+
+    started = time.perf_counter()
+    agent = InstaContentFactory().product_competitor_agent()
+    task = Task(
+        description="Reply with the single word OK.",
+        expected_output="The word OK.",
+        agent=agent,
+    )
+    Crew(agents=[agent], tasks=[task], verbose=False).kickoff()
+    return time.perf_counter() - started
+
+
+def report(name, timings):
+    print(f"{name:<28} min {min(timings) * 1000:8.1f} ms   median {statistics.median(timings) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--first-task", action="store_true", help="Also run one real LLM task (needs GOOGLE_API_KEY)")
+    args = parser.parse_args()
+
+    for module in ("crewai", "tools", "agents"):
+        report(f"import {module}", time_import(module, args.runs))
+    report("build ideation team", time_factory(args.runs))
+
+    if args.first_task:
+        if not os.getenv("GOOGLE_API_KEY"):
+            print("first task: skipped (GOOGLE_API_KEY not set)")
+        else:
+            print(f"{'first task latency':<28} {time_first_task() * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
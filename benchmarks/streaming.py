@@ -0,0 +1,59 @@
+"""
+Offline check and benchmark of streaming mode.
+
+Runs crew.stream_ideation for one product with every Gemini and Serper call
+served by replay.py (synthetic answers, as in benchmarks/pipeline.py) and a
+streaming replay model that hands out its answer in small chunks. Reports,
+per stage, the time to its first token and first option and the time to
+stage_complete, plus the number of events of each type. Exits with an error
+when no token or no option event comes out.
+
+Usage:
+    python benchmarks/streaming.py --llm-latency 0.2 --serper-latency 0.05
+"""
+import os
+import sys
+import time
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline import synthetic_llm, synthetic_serper  # noqa: E402  (sets up the offline environment)
+from crew import stream_ideation  # noqa: E402
+from replay import replay  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per replayed LLM call")
+    parser.add_argument("--serper-latency", type=float, default=0.05, help="Seconds per replayed Serper call")
+    args = parser.parse_args()
+
+    replay.llm_latency = args.llm_latency
+    replay.serper_latency = args.serper_latency
+    replay.llm_fallback = synthetic_llm
+    replay.serper_fallback = synthetic_serper
+
+    counts = Counter()
+    first = {}
+    started = time.perf_counter()
+    for event in stream_ideation("https://product-stream.example", "Streaming benchmark product"):
+        counts[event["type"]] += 1
+        if event["type"] == "error":
+            sys.exit(f"Pipeline failed: {event['error']}")
+        if "stage" in event:
+            first.setdefault((event["stage"], event["type"]), time.perf_counter() - started)
+
+    print(f"{'stage':<22} {'started':>8} {'token':>8} {'option':>8} {'complete':>8}")
+    for stage in dict.fromkeys(stage for stage, _ in first):
+        times = [first.get((stage, kind)) for kind in ("stage_started", "token", "option", "stage_complete")]
+        print(f"{stage:<22} " + ' '.join(f"{t:7.2f}s" if t is not None else f"{'-':>8}" for t in times))
+    print(f"events: {dict(counts)}")
+
+    if not counts["token"] or not counts["option"]:
+        sys.exit("Streaming produced no token or no option events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Persistent result cache for the web search and scraping tools.
+Entries are content-addressed, expire after a TTL and are evicted LRU-first
+once the store grows past its size bounds.
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from tracing import tracer
+
+
+def normalize_query(query):
+    """Collapse whitespace and case so equivalent queries share a cache entry."""
+    return ' '.join(str(query).split()).lower()
+
+
+def normalize_url(url):
+    """Canonicalize a URL: default scheme, lowercase host, no fragment, sorted query, no trailing slash."""
+    url = str(url).strip()
+    if '://' not in url:
+        url = f"https://{url}"
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    path = parts.path.rstrip('/')
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), host, path, query, ''))
+
+
+def make_key(namespace, value, **params):
+    """Build a content address from a namespace, a normalized value and request parameters."""
+    material = json.dumps(
+        {"ns": namespace, "value": value, "params": params},
+        sort_keys=True,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class _InFlight:
+    """A computation that concurrent callers for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    """SQLite-backed cache with TTL expiry, LRU eviction and in-process request dedup."""
+
+    def __init__(self, path, ttl=86400, max_entries=5000, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.dedup_waits = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._conn = None
+
+    def _connect(self):
+        """Open the store lazily so importing the tools never touches disk."""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    @contextmanager
+    def connection(self):
+        """Yield the store's connection under its lock, for callers keeping side tables in the same file."""
+        with self._lock:
+            conn = self._connect()
+            yield conn
+            conn.commit()
+
+    def get(self, key):
+        """Return the cached value for a key, or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return json.loads(value)
+
+    def set(self, key, value, namespace='default', ttl=None):
+        """Store a JSON-serializable value and evict old entries if over budget."""
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        payload = json.dumps(value)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, namespace, value, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, payload, len(payload), now + ttl, now),
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then least recently used ones until within bounds."""
+        self.evictions += conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,)).rowcount
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        while count > self.max_entries or total > self.max_bytes:
+            row = conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+            count -= 1
+            total -= row[1]
+            self.evictions += 1
+
+    def get_or_compute(self, namespace, value, compute, ttl=None, **params):
+        """Return a cached result or run `compute()` once, even under concurrent identical calls.
+
+        Exceptions raised by `compute` propagate to every waiting caller and are not cached.
+        """
+        key = make_key(namespace, value, **params)
+        cached = self.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            owner = inflight is None
+            if owner:
+                inflight = _InFlight()
+                self._inflight[key] = inflight
+            else:
+                self.dedup_waits += 1
+
+        if not owner:
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            with self._lock:
+                self.hits += 1
+            return inflight.value
+
+        with self._lock:
+            self.misses += 1
+        try:
+            result = compute()
+            self.set(key, result, namespace=namespace, ttl=ttl)
+            inflight.value = result
+            return result
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            inflight.done.set()
+
+    def stats(self):
+        """Return hit/miss counters for reporting."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "dedup_waits": self.dedup_waits,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        """Remove every entry from the store."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+
+
+# Shared cache used by the tools in tools.py
+tool_cache = ResultCache(
+    path=os.getenv("TOOL_CACHE_PATH", os.path.join(".cache", "tool_cache.sqlite3")),
+    ttl=int(os.getenv("TOOL_CACHE_TTL", "86400")),
+    max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "5000")),
+    max_bytes=int(os.getenv("TOOL_CACHE_MAX_BYTES", str(50 * 1024 * 1024))),
+)
+tracer.register_stats("tool_cache", tool_cache.stats)
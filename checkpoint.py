@@ -0,0 +1,109 @@
+"""
+Checkpoints of completed pipeline stages.
+Each task's output is saved as soon as the task finishes, keyed by the run
+(product and inputs) and the stage. A checkpoint is only reused when the
+task's prompt is unchanged, so a stage whose upstream context changed is
+run again while everything before the first failed stage is skipped.
+"""
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+class CheckpointStore:
+    """SQLite-backed store of stage outputs per run."""
+
+    def __init__(self, path, ttl=7 * 86400):
+        self.path = path
+        self.ttl = ttl
+        self.reused = 0
+        self.saved = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        """Open the store lazily so importing the pipeline never touches disk."""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS checkpoints (
+                    run_key TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (run_key, stage)
+                )"""
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, run_key, stage, prompt):
+        """Return the saved output of a stage, or None if missing, stale or expired."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT prompt_hash, output, created_at FROM checkpoints WHERE run_key = ? AND stage = ?",
+                (run_key, stage),
+            ).fetchone()
+            if row is None or row[0] != prompt_hash(prompt) or row[2] < time.time() - self.ttl:
+                return None
+            self.reused += 1
+            return row[1]
+
+    def save(self, run_key, stage, prompt, output):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (run_key, stage, prompt_hash, output, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (run_key, stage, prompt_hash(prompt), output, now),
+            )
+            conn.execute("DELETE FROM checkpoints WHERE created_at < ?", (now - self.ttl,))
+            conn.commit()
+            self.saved += 1
+
+    def stages(self, run_key):
+        """Names of the stages with a checkpoint for a run."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT stage FROM checkpoints WHERE run_key = ? AND created_at >= ?",
+                (run_key, time.time() - self.ttl),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def clear(self, run_key=None):
+        with self._lock:
+            conn = self._connect()
+            if run_key is None:
+                conn.execute("DELETE FROM checkpoints")
+            else:
+                conn.execute("DELETE FROM checkpoints WHERE run_key = ?", (run_key,))
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return {"reused": self.reused, "saved": self.saved}
+
+
+def checkpoint_store_from_env():
+    """Build the shared checkpoint store, or None when CHECKPOINTS=0."""
+    if os.getenv("CHECKPOINTS", "1") == "0":
+        return None
+    return CheckpointStore(
+        path=os.getenv("CHECKPOINT_PATH", os.path.join(".cache", "checkpoints.sqlite3")),
+        ttl=int(os.getenv("CHECKPOINT_TTL", str(7 * 86400))),
+    )
+
+
+checkpoint_store = checkpoint_store_from_env()
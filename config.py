@@ -3,12 +3,60 @@ Configuration module for the Stock Analysis CrewAI project.
 Handles environment setup and API key validation.
 """
 import os
+import time
+import threading
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 
-# Load environment variables
+# Load environment variables before the key pools below read them
 load_dotenv()
 
+from rate_limiter import limiter, PooledChatModel  # noqa: E402
+from streaming import StreamingChatGoogleGenerativeAI, stage_events_handler  # noqa: E402
+from llm_cache import prompt_cache, llm_cache_scope  # noqa: E402
+from tracing import tracing_handler  # noqa: E402
+from replay import replay, ReplayChatModel  # noqa: E402
+from routing import model_router, DEFAULT_ROUTE, TIER_POOLS, FallbackChatModel  # noqa: E402
+
+
+class LLMRegistry:
+    """Process-wide registry of LLM clients, created lazily and reused by every caller."""
+
+    def __init__(self, probe_ttl=300):
+        self.probe_ttl = probe_ttl
+        self._clients = {}
+        self._probed_at = {}
+        self._lock = threading.Lock()
+
+    def get(self, llm_class=ChatGoogleGenerativeAI, **settings):
+        """Return the shared client for these settings, building it on first use."""
+        key = (llm_class.__name__,) + tuple(sorted((k, repr(v)) for k, v in settings.items()))
+        with self._lock:
+            llm = self._clients.get(key)
+            if llm is None:
+                llm = llm_class(**settings)
+                self._clients[key] = llm
+            return llm
+
+    def probe(self, llm):
+        """Send a tiny request to check connectivity, at most once per `probe_ttl` seconds per client."""
+        now = time.monotonic()
+        with self._lock:
+            probed_at = self._probed_at.get(id(llm))
+            if probed_at is not None and now - probed_at < self.probe_ttl:
+                return False
+        # A cached answer would report the API as reachable without calling it
+        with llm_cache_scope(enabled=False):
+            test_response = llm.invoke("Hello")
+        with self._lock:
+            self._probed_at[id(llm)] = now
+        print(f"✅ Gemini LLM connection successful: {len(str(test_response))} chars")
+        return True
+
+
+llm_registry = LLMRegistry(probe_ttl=int(os.getenv("LLM_PROBE_TTL", "300")))
+
+
 class Config:
     """Configuration class for managing API keys and settings."""
     
@@ -23,45 +71,113 @@ class Config:
         os.environ["OPENAI_MODEL_NAME"] = ""
         os.environ["OPENAI_API_BASE"] = ""
         
-        # Set API keys from environment
-        self.google_api_key = os.getenv("GOOGLE_API_KEY")
-        self.serper_api_key = os.getenv("SERPER_API_KEY")
+        # Set API keys from environment (GOOGLE_API_KEYS / SERPER_API_KEYS add more keys to the pools)
+        self.google_api_keys = [key.value for key in limiter.get("gemini").keys]
+        self.serper_api_keys = [key.value for key in limiter.get("serper").keys]
+        self.google_api_key = self.google_api_keys[0] if self.google_api_keys else None
+        self.serper_api_key = self.serper_api_keys[0] if self.serper_api_keys else None
+
+        # crewai's verbose logging is costly on long runs; CREW_VERBOSE=0 turns it off
+        self.verbose = os.getenv("CREW_VERBOSE", "1") != "0"
 
     
     def _validate_keys(self):
         """Validate required API keys."""
-        if not self.google_api_key:
+        if not self.google_api_key and not replay.replaying:
             raise ValueError("GOOGLE_API_KEY not found in environment variables. Please add it to your .env file.")
         
-        if not self.serper_api_key:
+        if not self.serper_api_key and not replay.replaying:
             print("Warning: SERPER_API_KEY not found. Search functionality will be limited.")
         
 
     
-    def get_llm(self):
-        """Get configured Gemini LLM instance."""
-        try:
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-2.0-flash",
-                google_api_key=self.google_api_key,
-                temperature=0.1,  # Lower temperature for more consistent tool usage
+    def _pooled_llm(self, tier, route, streaming, **settings):
+        """The pooled client of one model tier with a route's temperature and output cap."""
+        # One client per key; the pool picks the key for every call
+        clients = [
+            llm_registry.get(
+                llm_class=StreamingChatGoogleGenerativeAI if streaming else ChatGoogleGenerativeAI,
+                model=model_router.model(tier),
+                google_api_key=api_key,
+                temperature=route.temperature,
                 verbose=False,
-                max_output_tokens=2048,
+                max_output_tokens=route.max_output_tokens,
+                # 429s fail over to another key instead of being retried on this one
+                max_retries=1,
                 # Removed convert_system_message_to_human as it's deprecated
                 # Removed safety_settings to use default values
             )
-            # Test connection
-            test_response = llm.invoke("Hello")
-            print(f"✅ Gemini LLM connection successful: {len(str(test_response))} chars")
+            for api_key in self.google_api_keys
+        ]
+        return llm_registry.get(
+            llm_class=PooledChatModel,
+            clients=clients,
+            pool=limiter.get(TIER_POOLS[tier]),
+            max_output_tokens=route.max_output_tokens,
+            **settings,
+        )
+
+    def get_llm(self, probe=False, streaming=False, route=None):
+        """Get the shared Gemini LLM instance.
+
+        The client is built once per process and reused. Pass `probe=True` to
+        check connectivity; the result is cached for `LLM_PROBE_TTL` seconds.
+        With `streaming=True` the client streams tokens to its callbacks.
+        With a routing.Route the model, temperature and output cap come from
+        the route, and calls fall back to other tiers when its tier is
+        rate-limited; without one every call goes to the default flash route.
+        """
+        # Every call is traced, reaches the streaming events of its stage (and is saved as a fixture when recording)
+        callbacks = [tracing_handler, stage_events_handler] + ([replay.recorder] if replay.recording else [])
+        if replay.replaying:
+            # Offline run: answers come from recorded fixtures, no key or quota needed
+            return llm_registry.get(
+                llm_class=ReplayChatModel,
+                model=model_router.model((route or DEFAULT_ROUTE).tier),
+                streaming=streaming,
+                callbacks=[tracing_handler, stage_events_handler],
+                cache=prompt_cache,
+            )
+        try:
+            if route is None:
+                # Reruns with the same prompts are answered from the local cache
+                llm = self._pooled_llm(DEFAULT_ROUTE.tier, DEFAULT_ROUTE, streaming,
+                                       callbacks=callbacks, cache=prompt_cache)
+            else:
+                # Tier clients stay untraced and uncached; the fallback model does both once per call
+                llm = llm_registry.get(
+                    llm_class=FallbackChatModel,
+                    tiers=[
+                        (tier, self._pooled_llm(tier, route, streaming))
+                        for tier in model_router.chain(route.tier)
+                    ],
+                    max_wait=model_router.max_wait,
+                    router=model_router,
+                    callbacks=callbacks,
+                    cache=prompt_cache,
+                )
+            if probe:
+                llm_registry.probe(llm)
             return llm
         except Exception as e:
             raise ConnectionError(f"Failed to initialize Gemini LLM: {e}")
     
+    def probe_stages(self, stages, streaming=False):
+        """Check connectivity of the routed LLMs the given stages use, one probe per model tier."""
+        routes = {}
+        for stage in stages:
+            route = model_router.route(stage)
+            routes.setdefault(route.tier, route)
+        for route in routes.values():
+            self.get_llm(probe=True, streaming=streaming, route=route)
+
     def display_status(self):
         """Display configuration status."""
         print("🔧 Marketing Analysis AI Configuration")
-        print(f"📍 Google API Key: {'✅ Found' if self.google_api_key else '❌ Missing'}")
-        print(f"🔍 Serper API Key: {'✅ Found' if self.serper_api_key else '❌ Missing'}")
+        print(f"📍 Google API Keys: {f'✅ {len(self.google_api_keys)} found' if self.google_api_keys else '❌ Missing'}")
+        print(f"🔍 Serper API Keys: {f'✅ {len(self.serper_api_keys)} found' if self.serper_api_keys else '❌ Missing'}")
+        if replay.mode != "off":
+            print(f"📼 Replay mode: {replay.mode} ({replay.directory})")
         print("✅ Configuration loaded - CrewAI will use Gemini exclusively")
 
 # Global config instance
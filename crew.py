@@ -1,93 +1,476 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import argparse
+import queue
+import threading
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from textwrap import dedent
 from crewai import Agent, Crew, Process
 
+from config import config
+from handoff import Handoff, HandoffStats
+from llm_cache import llm_cache_scope, SKIP_STAGES
+from scheduler import TaskGraph
+from streaming import StreamingCallbackHandler, stage_events
 from tasks import MarketingAnalysisTasks
 from agents import InstaContentFactory
+from agent_pool import AgentPool
+from tracing import tracer
+from checkpoint import checkpoint_store
+from knowledge import knowledge_store, subject_for
+from iteration import iteration_controller, IterationStats
+from variants import VariantGenerator, variant_matrix
+from prefetch import prefetcher, prefetching
+from routing import model_router
 
-def main():
-    tasks = MarketingAnalysisTasks()
-    agents = InstaContentFactory()
+def run_task(agent, task):
+    """Run a single task in its own crew and return its output."""
+    crew = Crew(
+        agents=[agent],
+        tasks=[task],
+        process=Process.sequential,
+        verbose=config.verbose,
+        memory=False,  # Disable memory to avoid conflicts
+        # Rate limiting is handled by the shared limiter in rate_limiter.py
+    )
+    return str(crew.kickoff())
 
-    print("## Welcome to the Marketing Crew")
-    print('-------------------------------')
-    product_website = input("What is the product website you want a marketing strategy for?\n")
-    product_details = input("Any extra details about the product and/or the Instagram post you want?\n")
 
-    try:
-        # Create Agents
-        product_competitor_agent = agents.product_competitor_agent()
+# Stages whose final answer is a list of three options
+OPTION_STAGES = ("ad_copy", "photo", "image")
+
+# Pipeline stages in order, and the MarketingAnalysisTasks method behind each
+STAGES = {
+    "product_analysis": "product_analysis",
+    "competitor_analysis": "competitor_analysis",
+    "campaign_development": "campaign_development",
+    "ad_copy": "instagram_ad_copy",
+    "photo": "take_photograph_task",
+    "image": "review_photo",
+}
+
+
+def stage_name(name):
+    """Resolve a stage or task method name (e.g. "review_photo") to its stage name."""
+    if name in STAGES:
+        return name
+    for stage, task_name in STAGES.items():
+        if task_name == name:
+            return stage
+    raise ValueError(f"Unknown stage '{name}', expected one of: {', '.join(STAGES)}")
+
+
+def build_ideation_graph(tasks, agents, product_website, product_details, on_event=None, budgets=None,
+                         checkpoints=checkpoint_store, rerun=()):
+    """Declare the ideation pipeline as a DAG of tasks.
+
+    Both analyses only depend on the inputs and run in parallel; campaign
+    development waits for both, the copy for the campaign, and the photo
+    stages start as soon as the copy is ready. When `on_event` is given it
+    receives token, option and stage events while the pipeline runs.
+
+    Tasks do not see each other's full answers: each answer is folded into a
+    shared `Handoff`, and the next task gets only the fields it needs, within
+    the token budget for that stage (`budgets`, defaulting to
+    HANDOFF_TOKEN_BUDGET). Returns the graph, the handoff, token stats and
+    iteration stats.
+
+    Every stage's output is saved to `checkpoints` as it completes; a stage
+    with a checkpoint for the same prompt is not run again unless it is
+    listed in `rerun`, so a failed run resumes at the stage that failed.
+    """
+    budgets = budgets or {}
+    rerun = {stage_name(name) for name in rerun}
+    run_key = product_key(product_website, product_details)
+    subject = subject_for(product_website)
+    handoff = Handoff()
+    stats = HandoffStats()
+    iterations = IterationStats()
+
+    # Each step builds (or leases) its own agent when it runs, so concurrently running tasks
+    # get separate instances and stages a run never reaches cost no LLM client or pooled agent
+    def stage(name, agent, task, handoff_text=""):
+        saved = None
+        if checkpoints is not None and name not in rerun:
+            saved = checkpoints.get(run_key, name, task.description)
+        if saved is not None:
+            stats.record(name, task.description, handoff_text, saved)
+            if on_event is not None:
+                on_event({"type": "stage_complete", "stage": name, "output": saved, "checkpoint": True})
+            return saved
+        events = None
+        if on_event is not None:
+            events = StreamingCallbackHandler(name, on_event, split_options=name in OPTION_STAGES)
+            on_event({"type": "stage_started", "stage": name})
+        # Creative stages and explicit reruns skip the LLM cache so they produce fresh output
+        with tracer.span("task", name), llm_cache_scope(enabled=name not in SKIP_STAGES and name not in rerun), \
+                stage_events(events), iteration_controller.task(name, agent) as task_iterations:
+            output = run_task(agent, task)
+        iterations.record(task_iterations)
+        if checkpoints is not None:
+            checkpoints.save(run_key, name, task.description, output)
+        stats.record(name, task.description, handoff_text, output)
+        if on_event is not None:
+            on_event({"type": "stage_complete", "stage": name, "output": output})
+        return output
+
+    def remember(learned):
+        # Research is kept for later campaigns about the same product or competitors; a whole
+        # answer standing in for a missing summary is not a fact worth retrieving later
+        if knowledge_store is not None and not learned.fallback:
+            for kind, items in learned.items():
+                knowledge_store.add(kind, subject, items, source=product_website)
+
+    def product_step():
+        product_analyst = agents.product_competitor_agent()
+        task = tasks.product_analysis(product_analyst, product_website, product_details)
+        output = stage("product_analysis", product_analyst, task)
+        remember(handoff.merge_summary(output, ("product_facts", "usps")))
+        return output
+
+    def competitor_step():
+        competitor_analyst = agents.product_competitor_agent("competitor_analysis")
+        task = tasks.competitor_analysis(competitor_analyst, product_website, product_details)
+        output = stage("competitor_analysis", competitor_analyst, task)
+        remember(handoff.merge_summary(output, ("competitors",)))
+        return output
+
+    def campaign_step(product_analysis, competitor_analysis):
         strategy_planner_agent = agents.strategy_planner_agent()
-        creative_agent = agents.creative_content_creator_agent()
-        
-        # Create Tasks
-        website_analysis = tasks.product_analysis(product_competitor_agent, product_website, product_details)
-        market_analysis = tasks.competitor_analysis(product_competitor_agent, product_website, product_details)
-        campaign_development = tasks.campaign_development(strategy_planner_agent, product_website, product_details)
-        write_copy = tasks.instagram_ad_copy(creative_agent)
-
-        # Create Crew responsible for Copy
-        copy_crew = Crew(
-            agents=[
-                product_competitor_agent,
-                strategy_planner_agent,
-                creative_agent
-            ],
-            tasks=[
-                website_analysis,
-                market_analysis,
-                campaign_development,
-                write_copy
-            ],
-            process=Process.sequential,
-            verbose=True,
-            memory=False,  # Disable memory to avoid conflicts
-            max_rpm=10,    # Rate limiting
-        )
+        context = handoff.render(("product_facts", "usps", "competitors"), budgets.get("campaign_development"))
+        task = tasks.campaign_development(strategy_planner_agent, product_website, product_details, handoff=context)
+        output = stage("campaign_development", strategy_planner_agent, task, context)
+        remember(handoff.merge_summary(output, ("audience", "campaign_ideas", "usps")))
+        return output
 
+    def copy_step(campaign_development):
         print("🚀 Starting copy generation...")
-        ad_copy = copy_crew.kickoff()
+        creative_agent = agents.creative_content_creator_agent()
+        context = handoff.render(("usps", "audience", "campaign_ideas"), budgets.get("ad_copy"))
+        task = tasks.instagram_ad_copy(creative_agent, handoff=context)
+        output = stage("ad_copy", creative_agent, task, context)
+        handoff.merge_options(output, "copy_options")
+        return output
 
-        # Create Crew responsible for Image
+    def photo_step(ad_copy):
+        print("📸 Starting image description generation...")
         senior_photographer = agents.senior_photographer_agent()
+        copy = handoff.render(("copy_options",), budgets.get("photo"))
+        task = tasks.take_photograph_task(senior_photographer, copy, product_website, product_details)
+        output = stage("photo", senior_photographer, task, copy)
+        handoff.merge_options(output, "photo_options")
+        return output
+
+    def review_step(photo):
         chief_creative_director = agents.chief_creative_director_agent()
-        
-        # Create Tasks for Image
-        take_photo = tasks.take_photograph_task(senior_photographer, ad_copy, product_website, product_details)
-        approve_photo = tasks.review_photo(chief_creative_director, product_website, product_details)
-
-        image_crew = Crew(
-            agents=[
-                senior_photographer,
-                chief_creative_director
-            ],
-            tasks=[
-                take_photo,
-                approve_photo
-            ],
-            process=Process.sequential,
-            verbose=True,
-            memory=False,  # Disable memory to avoid conflicts
-            max_rpm=10,    # Rate limiting
+        context = handoff.render(("photo_options", "usps", "audience"), budgets.get("image"))
+        task = tasks.review_photo(chief_creative_director, product_website, product_details, handoff=context)
+        return stage("image", chief_creative_director, task, context)
+
+    graph = TaskGraph()
+    graph.add("product_analysis", product_step)
+    graph.add("competitor_analysis", competitor_step)
+    graph.add("campaign_development", campaign_step, needs=("product_analysis", "competitor_analysis"))
+    graph.add("ad_copy", copy_step, needs=("campaign_development",))
+    graph.add("photo", photo_step, needs=("ad_copy",))
+    graph.add("image", review_step, needs=("photo",))
+    return graph, handoff, stats, iterations
+
+
+def run_ideation(tasks, agents, product_website, product_details, on_event=None, budgets=None,
+                 checkpoints=checkpoint_store, rerun=()):
+    """Run the copy and image pipeline for one product and return both results."""
+    # Reuses the prefetch started when the job was submitted, if any
+    prefetch = prefetcher.start(product_website) if prefetcher is not None else None
+    graph, handoff, stats, iterations = build_ideation_graph(
+        tasks, agents, product_website, product_details, on_event, budgets, checkpoints, rerun
+    )
+    with tracer.span("crew", "ideation", product_website=product_website), prefetching(prefetch):
+        results = graph.run()
+    return {
+        "ad_copy": results["ad_copy"],
+        "image": results["image"],
+        "token_stats": stats.to_dict(),
+        "iteration_stats": iterations.to_dict(),
+        "prefetch_stats": prefetch.stats() if prefetch is not None else None,
+    }
+
+
+def run_variants(tasks, agents, product_website, product_details, briefs, per_brief=2, photos=True):
+    """Run the analysis stages once, then fan out into ranked copy and photo variants per brief.
+
+    Only product analysis, competitor analysis and campaign development run
+    as crews (reusing checkpoints); the variants come from a few batched LLM
+    calls that share their context.
+    """
+    prefetch = prefetcher.start(product_website) if prefetcher is not None else None
+    graph, handoff, stats, iterations = build_ideation_graph(tasks, agents, product_website, product_details)
+    with tracer.span("crew", "variants", product_website=product_website), prefetching(prefetch):
+        graph.run(targets=("campaign_development",))
+        context = handoff.render(("product_facts", "usps", "audience", "campaign_ideas"))
+        generator = VariantGenerator(config.get_llm(route=model_router.route("variants")), tasks)
+        result = generator.run(
+            product_website, product_details, briefs, per_brief,
+            handoff=context, usps=handoff.to_dict()["usps"], photos=photos,
         )
+    result["token_stats"] = stats.to_dict()
+    return result
+
+
+def stream_ideation(product_website, product_details, tasks=None, agents=None, rerun=()):
+    """Run the pipeline in the background and yield its events as they happen.
+
+    Yields dicts with a "type" of "stage_started", "token", "option",
+    "stage_complete", and finally "done" (with the result) or "error".
+    """
+    tasks = tasks or MarketingAnalysisTasks()
+    agents = agents or InstaContentFactory(streaming=True)
+    events = queue.Queue()
+
+    def worker():
+        try:
+            result = run_ideation(tasks, agents, product_website, product_details, on_event=events.put, rerun=rerun)
+            events.put({"type": "done", "result": result})
+        except Exception as e:
+            events.put({"type": "error", "error": str(e)})
+
+    threading.Thread(target=worker, daemon=True).start()
+    while True:
+        event = events.get()
+        yield event
+        if event["type"] in ("done", "error"):
+            return
 
-        print("📸 Starting image description generation...")
-        image = image_crew.kickoff()
+
+def product_key(product_website, product_details):
+    """Stable identifier for a product request, used to resume batch runs."""
+    material = json.dumps([product_website.strip(), product_details.strip()])
+    return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+
+def load_products(input_path):
+    """Read products from a JSONL or CSV file with product_website and product_details columns."""
+    products = []
+    if input_path.lower().endswith('.csv'):
+        with open(input_path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(input_path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    for row in rows:
+        product_website = (row.get('product_website') or '').strip()
+        if not product_website:
+            continue
+        products.append({
+            "product_website": product_website,
+            "product_details": (row.get('product_details') or '').strip(),
+        })
+    return products
+
+
+def load_completed(output_path):
+    """Return the keys of products that already have a successful result in the output file."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+            if record.get('status') == 'ok':
+                completed.add(record['key'])
+    return completed
+
+
+def run_batch(input_path, output_path, concurrency=4, rerun=()):
+    """Run ideation for every product in a file, streaming results to a JSONL output.
+
+    Products that already have a successful record in the output are skipped,
+    so an interrupted run can be resumed by running the same command again.
+    With `rerun`, every product is run again but only the listed stages (and
+    stages whose inputs change as a result) skip their checkpoints.
+    """
+    products = load_products(input_path)
+    completed = set() if rerun else load_completed(output_path)
+    pending = [
+        p for p in products
+        if product_key(p['product_website'], p['product_details']) not in completed
+    ]
+    print(f"📦 {len(products)} products, {len(products) - len(pending)} already done, {len(pending)} to run")
+    if not pending:
+        return
+
+    tasks = MarketingAnalysisTasks()
+    # Build every agent once and lease them to workers instead of rebuilding per product
+    agent_pool = AgentPool(InstaContentFactory(), size=max(1, concurrency))
+    write_lock = threading.Lock()
+    succeeded = 0
+
+    def process(product):
+        key = product_key(product['product_website'], product['product_details'])
+        started = time.time()
+        try:
+            with agent_pool.lease() as agents:
+                result = run_ideation(
+                    tasks, agents, product['product_website'], product['product_details'], rerun=rerun
+                )
+            record = {"key": key, **product, "status": "ok", **result}
+        except Exception as e:
+            record = {"key": key, **product, "status": "error", "error": str(e)}
+        record["duration_s"] = round(time.time() - started, 2)
+        with write_lock:
+            with open(output_path, 'a', encoding='utf-8') as out:
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+        return record
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(process, product) for product in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            if record['status'] == 'ok':
+                succeeded += 1
+                print(f"✅ {record['product_website']} ({record['duration_s']}s)")
+            else:
+                print(f"❌ {record['product_website']}: {record['error']}")
+
+    print(f"📦 Batch finished: {succeeded}/{len(pending)} succeeded, results in {output_path}")
+
+
+def main(stream=False, rerun=()):
+    tasks = MarketingAnalysisTasks()
+    agents = InstaContentFactory(streaming=stream)
+    # Probe the routed clients the agents will actually call
+    config.probe_stages(STAGES, streaming=stream)
+
+    print("## Welcome to the Marketing Crew")
+    print('-------------------------------')
+    product_website = input("What is the product website you want a marketing strategy for?\n")
+    if prefetcher is not None:
+        # Research the website while the details are being typed
+        prefetcher.start(product_website)
+    product_details = input("Any extra details about the product and/or the Instagram post you want?\n")
+
+    if stream:
+        # One JSON event per line on stdout so downstream tools can start on
+        # option 1 right away; the crews' verbose logging goes to stderr
+        out = sys.stdout
+        with redirect_stdout(sys.stderr):
+            for event in stream_ideation(product_website, product_details, tasks, agents, rerun):
+                out.write(json.dumps(event) + '\n')
+                out.flush()
+        return
+
+    try:
+        result = run_ideation(tasks, agents, product_website, product_details, rerun=rerun)
 
         # Print results
         print("\n\n########################")
         print("## Here is the result")
         print("########################\n")
         print("Your post copy:")
-        print(ad_copy)
+        print(result["ad_copy"])
         print("\n\nYour image description:")
-        print(image)
+        print(result["image"])
+        saved = result["iteration_stats"]["total"]
+        print(f"\n🔁 {saved['iterations']} agent iterations ({saved['iterations_saved']} saved), "
+              f"{saved['tool_calls_saved']} tool calls saved "
+              f"({saved['repeated_tool_calls']} repeated and {saved['blocked_tool_calls']} unneeded)")
+        prefetch = result["prefetch_stats"]
+        if prefetch is not None:
+            print(f"⚡ {prefetch['served']} tool calls served from prefetch, ~{prefetch['saved_s']}s saved "
+                  f"({prefetch['missed']} still queued when asked for, "
+                  f"{prefetch['unused']} of {prefetch['prefetched']} prefetched results unused)")
+        routing = model_router.stats()
+        if routing["served"]:
+            served = ', '.join(f"{tier} {count}" for tier, count in sorted(routing["served"].items()))
+            print(f"🧭 LLM calls per model tier: {served} ({routing['fallbacks']} fell back to another tier)")
         
     except Exception as e:
         print(f"❌ Error occurred: {str(e)}")
         print("Please check your API keys and try again.")
+        if checkpoint_store is not None:
+            done = checkpoint_store.stages(product_key(product_website, product_details))
+            if done:
+                print(f"💾 Completed stages are saved ({', '.join(done)}); rerun with the same inputs to resume.")
+
+
+def main_variants(args):
+    """Interactive variant fanout: ask for the product, print the ranked variants and save them."""
+    tasks = MarketingAnalysisTasks()
+    agents = InstaContentFactory()
+    product_website = input("What is the product website you want a marketing strategy for?\n")
+    product_details = input("Any extra details about the product and/or the Instagram post you want?\n")
+    briefs = variant_matrix(args.tones, args.audiences, args.locales)
+    result = run_variants(tasks, agents, product_website, product_details, briefs, args.per_brief, not args.no_photos)
+
+    for stage in ("copy", "photo"):
+        print(f"\n## Top {stage} variants")
+        for variant in result[stage][:10]:
+            print(f"[{variant['score']:.2f}] ({variant['tone']}, {variant['audience']}, {variant['locale']}) {variant['text']}")
+    cost = result["cost"]
+    print(f"\n{len(result['copy'])} copy and {len(result['photo'])} photo variants from "
+          f"{cost['llm_calls']} LLM calls, ~{cost['tokens_per_variant']} tokens per variant")
+    with open(args.variants_output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"Saved to {args.variants_output}")
+
+
+def csv_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def print_profile(file=None):
+    """Print where the run spent its time, by crew, task, agent step, tool and LLM call."""
+    print("\n## Profile", file=file)
+    print(tracer.summary_table(), file=file)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Instagram post ideation crew")
+    parser.add_argument("--batch", metavar="INPUT", help="JSONL or CSV file of products to run non-interactively")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file that batch results are appended to")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of products processed at once in batch mode")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Split a batch across this many worker processes, each with --concurrency products at once")
+    parser.add_argument("--stream", action="store_true", help="Print tokens and completed options as JSON lines while running")
+    parser.add_argument("--profile", action="store_true", help="Print per-stage latency, tokens, bytes and retries at the end")
+    parser.add_argument("--variants", action="store_true", help="Generate many ranked copy/photo variants from one analysis")
+    parser.add_argument("--tones", type=csv_list, default=["playful", "premium", "urgent"], help="Comma-separated tones for --variants")
+    parser.add_argument("--audiences", type=csv_list, default=["general"], help="Comma-separated audiences for --variants")
+    parser.add_argument("--locales", type=csv_list, default=["en-US"], help="Comma-separated locales for --variants")
+    parser.add_argument("--per-brief", type=int, default=2, help="Copy variants per tone/audience/locale combination")
+    parser.add_argument("--no-photos", action="store_true", help="Only generate copy variants")
+    parser.add_argument("--variants-output", default="variants.json", help="JSON file the variants are written to")
+    parser.add_argument("--rerun", nargs="+", default=(), metavar="STAGE", type=stage_name,
+                        help=f"Run these stages again instead of using their checkpoints ({', '.join(STAGES)})")
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.variants:
+        main_variants(args)
+    elif args.batch and args.processes > 1:
+        # Imported here because sharding.py builds on this module
+        from sharding import run_sharded
+        run_sharded(args.batch, args.output, args.processes, args.concurrency, args.rerun)
+    elif args.batch:
+        run_batch(args.batch, args.output, args.concurrency, args.rerun)
+    else:
+        main(stream=args.stream, rerun=args.rerun)
+    if args.profile:
+        # Keep stdout clean for the JSON events in stream mode
+        print_profile(file=sys.stderr if args.stream else None)
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+Streaming content extraction for scraped pages.
+Decodes the page text out of a Serper scrape response as it downloads,
+scores each block of text by information density, drops navigation, cookie
+banners and legal boilerplate, and stops reading once enough high-value
+content has been collected.
+"""
+import os
+import re
+
+EXTRACTOR_VERSION = 2
+
+BOILERPLATE_PATTERNS = re.compile(
+    r'cookie|privacy policy|terms of (service|use)|all rights reserved|copyright|©|'
+    r'sign in|log in|sign up|create account|subscribe|newsletter|skip to (main )?content|'
+    r'accept all|manage preferences|javascript|your cart|add to cart|wishlist|'
+    r'follow us|back to top|sitemap|powered by',
+    re.IGNORECASE,
+)
+WORD = re.compile(r"[A-Za-zÀ-ÿ][A-Za-zÀ-ÿ'\-]*")
+PLAIN_RUN = re.compile(r'[^"\\]+')
+
+
+def score_block(block):
+    """Score a block of text by how much readable, non-boilerplate content it carries."""
+    words = WORD.findall(block)
+    if len(words) < 4:
+        # Menu items, buttons and breadcrumb fragments
+        return 0.0
+    letters = sum(c.isalpha() for c in block)
+    alpha_ratio = letters / max(1, len(block))
+    avg_word = sum(len(w) for w in words) / len(words)
+    score = len(words) * alpha_ratio
+    if block.rstrip()[-1:] in '.!?':
+        # Full sentences are far more likely to be real copy than UI labels
+        score *= 1.5
+    if avg_word < 3 or avg_word > 12:
+        score *= 0.5
+    hits = len(BOILERPLATE_PATTERNS.findall(block))
+    if hits:
+        score /= 1 + 2 * hits
+    return score
+
+
+class StreamingExtractor:
+    """Keeps high-scoring text blocks fed to it until `budget_chars` is filled."""
+
+    def __init__(self, budget_chars=3000, min_score=4.0):
+        self.budget_chars = budget_chars
+        self.min_score = min_score
+        self.kept = []
+        self.kept_chars = 0
+        self.seen = set()
+        self.buffer = ""
+        self.blocks_seen = 0
+
+    @property
+    def full(self):
+        return self.kept_chars >= self.budget_chars
+
+    def feed(self, text):
+        """Consume more page text; returns True once the budget is filled."""
+        self.buffer += text
+        while '\n' in self.buffer and not self.full:
+            line, self.buffer = self.buffer.split('\n', 1)
+            self._consider(line)
+        return self.full
+
+    def _consider(self, line):
+        block = ' '.join(line.split())
+        if not block:
+            return
+        self.blocks_seen += 1
+        key = block.lower()
+        if key in self.seen:
+            # Repeated headers, footers and "read more" links
+            return
+        self.seen.add(key)
+        if score_block(block) < self.min_score:
+            return
+        # Kept blocks are joined with newlines, which count against the budget too
+        separator = 1 if self.kept else 0
+        remaining = self.budget_chars - self.kept_chars - separator
+        if len(block) > remaining:
+            block = block[:max(0, remaining - 3)].rsplit(' ', 1)[0] + '...'
+            if len(block) > remaining or block == '...':
+                # Not even a word fits; the budget is as full as it gets
+                self.kept_chars = self.budget_chars
+                return
+        self.kept.append(block)
+        self.kept_chars += separator + len(block)
+
+    def finish(self):
+        """Flush the last partial line and return the extracted text."""
+        if self.buffer and not self.full:
+            self._consider(self.buffer)
+        self.buffer = ""
+        return '\n'.join(self.kept)
+
+
+class JsonStringFieldDecoder:
+    """Incrementally decodes the value of one top-level string field from a JSON byte stream."""
+
+    ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field='text'):
+        self.opening = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self.pending = ""
+        self.in_value = False
+        self.done = False
+        self.high_surrogate = None
+
+    def feed(self, chunk):
+        """Consume decoded characters and return the newly decoded part of the field's value."""
+        if self.done:
+            return ""
+        self.pending += chunk
+        if not self.in_value:
+            match = self.opening.search(self.pending)
+            if not match:
+                # Keep a tail in case the key is split across chunks
+                self.pending = self.pending[-64:]
+                return ""
+            self.in_value = True
+            self.pending = self.pending[match.end():]
+        return self._decode()
+
+    def _decode(self):
+        out = []
+        i = 0
+        text = self.pending
+        while i < len(text):
+            run = PLAIN_RUN.match(text, i)
+            if run:
+                out.append(run.group())
+                i = run.end()
+                continue
+            ch = text[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if i + 1 >= len(text):
+                break  # Escape split across chunks
+            code = text[i + 1]
+            if code == 'u':
+                if i + 6 > len(text):
+                    break
+                point = int(text[i + 2:i + 6], 16)
+                i += 6
+                if 0xD800 <= point < 0xDC00:
+                    self.high_surrogate = point
+                    continue
+                if 0xDC00 <= point < 0xE000 and self.high_surrogate is not None:
+                    point = 0x10000 + ((self.high_surrogate - 0xD800) << 10) + (point - 0xDC00)
+                    self.high_surrogate = None
+                out.append(chr(point))
+                continue
+            out.append(self.ESCAPES.get(code, code))
+            i += 2
+        self.pending = text[i:]
+        return ''.join(out)
+
+
+def extract_from_stream(chunks, budget_chars=3000, min_score=4.0, field='text'):
+    """Extract high-value content from an iterable of text chunks of a JSON scrape response.
+
+    Stops pulling chunks as soon as the budget is filled. Returns
+    (content, stats) where stats reports how much was read and kept.
+    """
+    decoder = JsonStringFieldDecoder(field)
+    extractor = StreamingExtractor(budget_chars, min_score)
+    chars_read = 0
+    stopped_early = False
+    for chunk in chunks:
+        chars_read += len(chunk)
+        if extractor.feed(decoder.feed(chunk)):
+            stopped_early = True
+            break
+        if decoder.done:
+            break
+    content = extractor.finish()
+    return content, {
+        "chars_read": chars_read,
+        "chars_kept": len(content),
+        "blocks_seen": extractor.blocks_seen,
+        "stopped_early": stopped_early,
+    }
+
+
+SCRAPE_CHAR_BUDGET = int(os.getenv("SCRAPE_CHAR_BUDGET", "3000"))
+SCRAPE_MIN_SCORE = float(os.getenv("SCRAPE_MIN_SCORE", "4.0"))
@@ -0,0 +1,191 @@
+"""
+Structured handoff between pipeline tasks.
+Each task ends its answer with a small JSON summary; the next task receives a
+rendering of only the fields it needs, trimmed to a token budget, instead of
+the full text of every earlier answer.
+"""
+import os
+import re
+import json
+import threading
+from dataclasses import dataclass, field, fields as dataclass_fields
+
+from streaming import OptionSplitter
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to a character estimate
+    _encoding = None
+
+SUMMARY_BLOCK = re.compile(r'```json\s*(\{.*?\})\s*```', re.DOTALL)
+
+FIELD_LABELS = {
+    "product_facts": "Product facts",
+    "usps": "Unique selling points",
+    "competitors": "Competitors",
+    "audience": "Target audience",
+    "campaign_ideas": "Campaign ideas",
+    "copy_options": "Ad copy options",
+    "photo_options": "Photo options",
+}
+
+DEFAULT_BUDGET = int(os.getenv("HANDOFF_TOKEN_BUDGET", "800"))
+
+
+def count_tokens(text):
+    """Count tokens with tiktoken when available, otherwise estimate ~4 characters per token."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text down to at most `max_tokens` tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens]).rstrip() + "..."
+    return text[:max_tokens * 4].rstrip() + "..."
+
+
+def summary_instructions(*field_names):
+    """Prompt snippet asking a task to end its answer with a JSON summary of the given fields."""
+    keys = ', '.join(f'"{name}"' for name in field_names)
+    return (
+        "After your answer, add a JSON summary for your co-workers in a ```json block "
+        f"with the keys {keys}, each a list of short strings (at most 25 words each, "
+        "most important first)."
+    )
+
+
+def strip_summary(text):
+    """Remove the JSON summary block from an answer meant for people."""
+    return SUMMARY_BLOCK.sub('', text).strip()
+
+
+class Summary(dict):
+    """Fields read from a task's JSON summary.
+
+    `fallback` is set when the model left the summary out and the answer
+    text stands in for the first field, so it is not a distilled fact.
+    """
+
+    fallback = False
+
+
+@dataclass
+class Handoff:
+    """Typed intermediate representation passed from one task to the next."""
+
+    product_facts: list = field(default_factory=list)
+    usps: list = field(default_factory=list)
+    competitors: list = field(default_factory=list)
+    audience: list = field(default_factory=list)
+    campaign_ideas: list = field(default_factory=list)
+    copy_options: list = field(default_factory=list)
+    photo_options: list = field(default_factory=list)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_summary(text, field_names):
+        """Read the given fields from the JSON summary at the end of a task answer.
+
+        When the model skipped the summary, the first field falls back to the
+        answer text itself so nothing is lost.
+        """
+        matches = SUMMARY_BLOCK.findall(text)
+        data = {}
+        if matches:
+            try:
+                data = json.loads(matches[-1])
+            except json.JSONDecodeError:
+                data = {}
+        if not any(data.get(name) for name in field_names):
+            parsed = Summary({field_names[0]: [strip_summary(text)]})
+            parsed.fallback = True
+            return parsed
+        parsed = Summary()
+        for name in field_names:
+            values = data.get(name) or []
+            if isinstance(values, str):
+                values = [values]
+            parsed[name] = [str(v).strip() for v in values if str(v).strip()]
+        return parsed
+
+    def merge_summary(self, text, field_names):
+        """Merge the JSON summary at the end of a task answer into the given fields; returns what was merged."""
+        parsed = self.parse_summary(text, field_names)
+        with self._lock:
+            for name, values in parsed.items():
+                getattr(self, name).extend(values)
+        return parsed
+
+    def merge_options(self, text, field_name):
+        """Split a numbered list of options out of a task answer into a field."""
+        options = []
+        splitter = OptionSplitter(lambda index, option: options.append(option))
+        splitter.feed(text)
+        splitter.finish()
+        with self._lock:
+            getattr(self, field_name).extend(options or [text.strip()])
+
+    def render(self, field_names, budget=None):
+        """Render the given fields as text, keeping the most important items within `budget` tokens."""
+        budget = DEFAULT_BUDGET if budget is None else budget
+        with self._lock:
+            sections = [(name, list(getattr(self, name))) for name in field_names]
+        lines = []
+        used = 0
+        # Take items round-robin so every field gets its top entries before any field gets more
+        depth = max((len(items) for _, items in sections), default=0)
+        chosen = {name: [] for name, _ in sections}
+        for i in range(depth):
+            for name, items in sections:
+                if i >= len(items):
+                    continue
+                item = items[i]
+                # The field's label line is paid for along with its first item
+                label_cost = 0 if chosen[name] else count_tokens(f"{FIELD_LABELS[name]}:") + 1
+                cost = label_cost + count_tokens(item) + 2
+                if used + cost > budget:
+                    # A field's top item is worth keeping in part rather than dropping
+                    if chosen[name] or budget - used - label_cost < 20:
+                        continue
+                    item = truncate_to_tokens(item, budget - used - label_cost - 2)
+                    cost = budget - used
+                chosen[name].append(item)
+                used += cost
+        for name, _ in sections:
+            if chosen[name]:
+                lines.append(f"{FIELD_LABELS[name]}:")
+                lines.extend(f"- {item}" for item in chosen[name])
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        with self._lock:
+            return {f.name: list(getattr(self, f.name)) for f in dataclass_fields(self)}
+
+
+class HandoffStats:
+    """Per-stage token accounting for prompts, handoffs and answers."""
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, prompt, handoff_text, output):
+        with self._lock:
+            self.stages[stage] = {
+                "prompt_tokens": count_tokens(prompt),
+                "handoff_tokens": count_tokens(handoff_text),
+                "output_tokens": count_tokens(output),
+            }
+
+    def to_dict(self):
+        with self._lock:
+            return dict(self.stages)
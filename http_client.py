@@ -0,0 +1,146 @@
+"""
+Shared, pooled HTTP clients for the Serper tools.
+The sync client wraps a keep-alive requests.Session; the async client wraps an
+aiohttp session. Both retry 5xx responses and timeouts with jittered
+exponential backoff. 429s are left to the rate limiter.
+"""
+import os
+import random
+import asyncio
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (500, 502, 503, 504)
+BACKOFF_MAX = 120  # urllib3's Retry.DEFAULT_BACKOFF_MAX
+
+
+def backoff_delay(attempt, base):
+    """Exponential backoff plus up to `base` seconds of jitter, as the sync client's Retry sleeps."""
+    return min(BACKOFF_MAX, base * 2 ** (attempt - 1) + random.uniform(0, base))
+
+
+class HttpClient:
+    """Thread-safe pooled HTTP client with keep-alive and retries."""
+
+    def __init__(self, pool_size=20, per_host=10, retries=3, backoff=0.5):
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The shared session, built on first use."""
+        with self._lock:
+            if self._session is None:
+                retry = Retry(
+                    total=self.retries,
+                    connect=self.retries,
+                    read=self.retries,
+                    status=self.retries,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=None,  # Serper calls are POSTs but idempotent
+                    backoff_factor=self.backoff,
+                    backoff_jitter=self.backoff,
+                    raise_on_status=False,
+                    respect_retry_after_header=False,
+                )
+                # pool_connections = number of hosts kept, pool_maxsize = connections per host
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_size,
+                    pool_maxsize=self.per_host,
+                    pool_block=True,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def post_json(self, url, payload, headers=None, timeout=30, stream=False):
+        """POST a JSON payload and return the response; with `stream=True` the body is read lazily."""
+        return self.session.post(url, json=payload, headers=headers, timeout=timeout, stream=stream)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class AsyncHttpClient:
+    """Pooled asyncio HTTP client; use as `async with async_http_client() as client:`."""
+
+    def __init__(self, pool_size=20, per_host=10, retries=3, backoff=0.5, keepalive=30):
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.keepalive = keepalive
+        self._session = None
+
+    async def __aenter__(self):
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.per_host,
+            keepalive_timeout=self.keepalive,
+        )
+        self._session = aiohttp.ClientSession(connector=connector)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+        self._session = None
+
+    async def post_json(self, url, payload, headers=None, timeout=30):
+        """POST a JSON payload and return (status, parsed JSON body), retrying 5xx and timeouts."""
+        import aiohttp
+
+        for attempt in range(1, self.retries + 2):
+            try:
+                async with self._session.post(
+                    url, json=payload, headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                ) as response:
+                    if response.status in RETRY_STATUSES and attempt <= self.retries:
+                        await asyncio.sleep(backoff_delay(attempt, self.backoff))
+                        continue
+                    response.raise_for_status()
+                    return response.status, await response.json()
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+                if attempt > self.retries:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, self.backoff))
+
+    async def post_json_many(self, requests_, timeout=30):
+        """Run several `(url, payload, headers)` POSTs concurrently; failures are returned as exceptions."""
+        return await asyncio.gather(
+            *(self.post_json(url, payload, headers, timeout) for url, payload, headers in requests_),
+            return_exceptions=True,
+        )
+
+
+def client_settings_from_env():
+    return {
+        "pool_size": int(os.getenv("HTTP_POOL_SIZE", "20")),
+        "per_host": int(os.getenv("HTTP_POOL_PER_HOST", "10")),
+        "retries": int(os.getenv("HTTP_RETRIES", "3")),
+        "backoff": float(os.getenv("HTTP_BACKOFF", "0.5")),
+    }
+
+
+def async_http_client():
+    """A new AsyncHttpClient with the shared pool settings; its session lives in the caller's event loop."""
+    return AsyncHttpClient(keepalive=float(os.getenv("HTTP_KEEPALIVE", "30")), **client_settings_from_env())
+
+
+# Shared client used by tools.py
+http_client = HttpClient(**client_settings_from_env())
@@ -0,0 +1,216 @@
+"""
+Adaptive iteration budgets and tool-call deduplication for agents.
+
+Each task gets an iteration budget learned from how many steps the same
+stage needed in earlier runs. Within a task, a tool called again with the
+same arguments is answered from the earlier result, and once the task has
+gathered enough material (or is about to run out of budget) further tool
+calls are cut short with an instruction to give the final answer.
+"""
+import os
+import json
+import threading
+import functools
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+from tracing import tracer
+
+# Starting budget per stage before any history is available
+DEFAULT_BUDGETS = {
+    "product_analysis": 4,
+    "competitor_analysis": 5,
+    "campaign_development": 3,
+    "ad_copy": 2,
+    "photo": 2,
+    "image": 2,
+}
+
+# Iteration limit each stage's agent had before adaptive budgets: max_iter=3, or crewai's
+# default of 25 for the photographer and the creative director
+BASELINE_MAX_ITER = {
+    "product_analysis": 3,
+    "competitor_analysis": 3,
+    "campaign_development": 3,
+    "ad_copy": 3,
+    "photo": 25,
+    "image": 25,
+}
+
+# Characters of tool output after which a task has enough material to answer
+EVIDENCE_TARGETS = {
+    "product_analysis": 8000,
+    "competitor_analysis": 12000,
+    "campaign_development": 6000,
+}
+
+REPEAT_NOTE = (
+    "You already used this tool with this input earlier in this task. "
+    "Here is the same result again; use it instead of repeating the call."
+)
+STOP_NOTE = (
+    "You already have enough information for this task. "
+    "Do not use any more tools; give your Final Answer now."
+)
+
+_current_task = contextvars.ContextVar("iteration_task", default=None)
+
+
+class TaskIterations:
+    """Iteration and tool-call bookkeeping for one running task."""
+
+    def __init__(self, stage, budget, evidence_target=None):
+        self.stage = stage
+        self.budget = budget
+        self.evidence_target = evidence_target
+        self.iterations = 0
+        self.tool_calls = 0
+        self.repeated = 0
+        self.blocked = 0
+        self.evidence_chars = 0
+        self.results = {}
+        # What search results this task has already shown the agent, see search_format.py
+        self.shown_urls = set()
+        self.shown_snippets = []
+        self._lock = threading.Lock()
+
+    def satisfied(self):
+        """Enough material gathered, or the next tool call would use up the budget."""
+        if self.evidence_target and self.evidence_chars >= self.evidence_target:
+            return True
+        return self.tool_calls >= self.budget - 1
+
+    def to_dict(self):
+        return {
+            "iterations": self.iterations,
+            "budget": self.budget,
+            # Against the fixed limit the stage had before adaptive budgets
+            "iterations_saved": max(0, BASELINE_MAX_ITER.get(self.stage, self.budget) - self.iterations),
+            "tool_calls": self.tool_calls,
+            "repeated_tool_calls": self.repeated,
+            "blocked_tool_calls": self.blocked,
+            # Skipped calls still cost the agent an iteration to read the memo or stop note
+            "tool_calls_saved": self.repeated + self.blocked,
+        }
+
+
+def current_task():
+    """The task running in this context, or None outside of one."""
+    return _current_task.get()
+
+
+class IterationController:
+    """Learns per-stage iteration budgets and polices tool calls inside tasks."""
+
+    def __init__(self, min_budget=2, max_budget=6, history=20):
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self._history = {}
+        self._history_size = history
+        self._lock = threading.Lock()
+
+    def budget(self, stage):
+        """Budget for the next run of a stage: the 90th percentile of recent runs, within bounds."""
+        with self._lock:
+            history = sorted(self._history.get(stage, ()))
+        if not history:
+            budget = DEFAULT_BUDGETS.get(stage, self.max_budget)
+        else:
+            budget = history[min(len(history) - 1, int(len(history) * 0.9))]
+        return max(self.min_budget, min(self.max_budget, budget))
+
+    def _learn(self, task):
+        # A task that used its whole budget may have been cut off, so ask for one more next time
+        needed = task.iterations + 1 if task.iterations >= task.budget else task.iterations
+        with self._lock:
+            self._history.setdefault(task.stage, deque(maxlen=self._history_size)).append(max(1, needed))
+
+    @contextmanager
+    def task(self, stage, agent):
+        """Apply the stage's budget to the agent and track the task run inside the block."""
+        current = TaskIterations(stage, self.budget(stage), EVIDENCE_TARGETS.get(stage))
+        apply_budget(agent, current.budget)
+        token = _current_task.set(current)
+        try:
+            yield current
+        finally:
+            _current_task.reset(token)
+        self._learn(current)
+
+    def step_callback(self, step):
+        """crewai step_callback: counts the iteration, then records it for tracing."""
+        current = _current_task.get()
+        if current is not None:
+            with current._lock:
+                current.iterations += 1
+        tracer.step_callback(step)
+
+    def tool_call(self, name, arguments, compute):
+        """Run a tool call unless it repeats an earlier one or the task already has enough."""
+        current = _current_task.get()
+        if current is None:
+            return compute()
+        key = (name, json.dumps(arguments, sort_keys=True, default=str).lower())
+        with current._lock:
+            if key in current.results:
+                current.repeated += 1
+                return f"{REPEAT_NOTE}\n{current.results[key]}"
+            if current.satisfied():
+                current.blocked += 1
+                return STOP_NOTE
+            current.tool_calls += 1
+        result = compute()
+        with current._lock:
+            current.results[key] = result
+            current.evidence_chars += len(str(result))
+        return result
+
+
+def apply_budget(agent, budget):
+    """Set an agent's iteration limit, including on an executor crewai already built."""
+    agent.max_iter = budget
+    executor = getattr(agent, "agent_executor", None)
+    if executor is not None:
+        executor.max_iterations = budget
+        if hasattr(executor, "force_answer_max_iterations"):
+            executor.force_answer_max_iterations = budget - 1
+
+
+def deduplicated(fn):
+    """Route a tool function through the controller; goes under crewai's @tool decorator."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        arguments = [' '.join(str(a).split()) for a in args] + sorted(
+            (k, ' '.join(str(v).split())) for k, v in kwargs.items()
+        )
+        return iteration_controller.tool_call(fn.__name__, arguments, lambda: fn(*args, **kwargs))
+    return wrapper
+
+
+class IterationStats:
+    """Per-stage iteration report for one run."""
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, task):
+        with self._lock:
+            self.stages[task.stage] = task.to_dict()
+
+    def to_dict(self):
+        with self._lock:
+            stages = dict(self.stages)
+        totals = {
+            key: sum(stage[key] for stage in stages.values())
+            for key in ("iterations", "iterations_saved", "tool_calls", "repeated_tool_calls", "blocked_tool_calls",
+                        "tool_calls_saved")
+        }
+        return {"stages": stages, "total": totals}
+
+
+iteration_controller = IterationController(
+    min_budget=int(os.getenv("AGENT_MIN_ITER", "2")),
+    max_budget=int(os.getenv("AGENT_MAX_ITER", "6")),
+)
@@ -0,0 +1,192 @@
+"""
+Local knowledge store of research from earlier campaigns.
+Product facts, USPs, competitor profiles, audiences and Instagram findings
+produced by the analyst and strategist agents are kept in SQLite with a
+full-text index, so later runs can look them up before searching the web.
+Every kind of entry has its own freshness window.
+"""
+import os
+import re
+import time
+import sqlite3
+import threading
+from urllib.parse import urlsplit
+
+from tracing import tracer
+
+# How long each kind of knowledge stays trustworthy, in days
+FRESHNESS_DAYS = {
+    "product_facts": 30,
+    "usps": 30,
+    "competitors": 14,
+    "audience": 30,
+    "campaign_ideas": 7,
+    "instagram": 3,
+}
+
+# Freshness of kinds missing from FRESHNESS_DAYS
+DEFAULT_FRESHNESS_DAYS = 7
+MAX_ENTRY_CHARS = 1000
+STOPWORDS = {"the", "and", "for", "with", "com", "www", "http", "https", "site", "instagram"}
+
+
+def subject_for(product_website):
+    """The product's domain, used as the subject of everything learned about it."""
+    url = product_website.strip()
+    host = urlsplit(url if '://' in url else f"https://{url}").netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def freshness_from_env():
+    """FRESHNESS_DAYS with overrides from KNOWLEDGE_FRESHNESS, e.g. "competitors=7,instagram=1"."""
+    freshness = dict(FRESHNESS_DAYS)
+    for item in os.getenv("KNOWLEDGE_FRESHNESS", "").split(","):
+        if "=" in item:
+            kind, days = item.split("=", 1)
+            freshness[kind.strip()] = float(days)
+    return freshness
+
+
+def match_query(text):
+    """FTS5 query matching any meaningful word of the text."""
+    terms = [t for t in re.findall(r'\w+', text.lower()) if len(t) > 2 and t not in STOPWORDS]
+    return ' OR '.join(f'"{t}"' for t in dict.fromkeys(terms))
+
+
+class KnowledgeStore:
+    """SQLite store of research entries with an FTS5 index over text and subject."""
+
+    def __init__(self, path, freshness=None, prune_every=100):
+        self.path = path
+        self.freshness = freshness or dict(FRESHNESS_DAYS)
+        self.prune_every = prune_every
+        self.lookups = 0
+        self.hits = 0
+        self.pruned = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        """Open the store lazily so importing the tools never touches disk."""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """CREATE TABLE IF NOT EXISTS knowledge (
+                    id INTEGER PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    source TEXT,
+                    updated_at REAL NOT NULL,
+                    UNIQUE (kind, subject, text)
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_fts USING fts5(
+                    text, subject, content='knowledge', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS knowledge_ai AFTER INSERT ON knowledge BEGIN
+                    INSERT INTO knowledge_fts (rowid, text, subject) VALUES (new.id, new.text, new.subject);
+                END;
+                CREATE TRIGGER IF NOT EXISTS knowledge_ad AFTER DELETE ON knowledge BEGIN
+                    INSERT INTO knowledge_fts (knowledge_fts, rowid, text, subject)
+                    VALUES ('delete', old.id, old.text, old.subject);
+                END;"""
+            )
+            # Entries that went stale since the last run are dropped on startup
+            self.pruned += self._delete_stale(self._conn)
+            self._conn.commit()
+        return self._conn
+
+    def add(self, kind, subject, items, source=None):
+        """Store entries of one kind about a subject; known entries only get their timestamp refreshed."""
+        now = time.time()
+        rows = [(kind, subject, str(item).strip()[:MAX_ENTRY_CHARS], source, now) for item in items if str(item).strip()]
+        if not rows:
+            return 0
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT INTO knowledge (kind, subject, text, source, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (kind, subject, text) DO UPDATE SET updated_at = excluded.updated_at, "
+                "source = COALESCE(excluded.source, source)",
+                rows,
+            )
+            self._writes += 1
+            if self.prune_every and self._writes % self.prune_every == 0:
+                self.pruned += self._delete_stale(conn)
+            conn.commit()
+        return len(rows)
+
+    def _is_fresh(self, kind, updated_at, now):
+        return now - updated_at <= self.freshness.get(kind, DEFAULT_FRESHNESS_DAYS) * 86400
+
+    def search(self, query, kinds=None, limit=8):
+        """Return fresh entries matching the query, best match first."""
+        expression = match_query(query)
+        if not expression:
+            return []
+        now = time.time()
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT k.kind, k.subject, k.text, k.source, k.updated_at FROM knowledge_fts "
+                "JOIN knowledge k ON k.id = knowledge_fts.rowid "
+                "WHERE knowledge_fts MATCH ? ORDER BY rank LIMIT ?",
+                (expression, limit * 5),
+            ).fetchall()
+            self.lookups += 1
+        results = [
+            {"kind": kind, "subject": subject, "text": text, "source": source, "age_days": (now - updated_at) / 86400}
+            for kind, subject, text, source, updated_at in rows
+            if (kinds is None or kind in kinds) and self._is_fresh(kind, updated_at, now)
+        ][:limit]
+        if results:
+            with self._lock:
+                self.hits += 1
+        return results
+
+    def _delete_stale(self, conn):
+        now = time.time()
+        removed = 0
+        for kind, days in self.freshness.items():
+            removed += conn.execute(
+                "DELETE FROM knowledge WHERE kind = ? AND updated_at < ?", (kind, now - days * 86400)
+            ).rowcount
+        kinds = list(self.freshness)
+        removed += conn.execute(
+            f"DELETE FROM knowledge WHERE kind NOT IN ({', '.join('?' * len(kinds))}) AND updated_at < ?",
+            (*kinds, now - DEFAULT_FRESHNESS_DAYS * 86400),
+        ).rowcount
+        return removed
+
+    def prune(self):
+        """Delete entries past their freshness window; also done on startup and every `prune_every` writes."""
+        with self._lock:
+            conn = self._connect()
+            removed = self._delete_stale(conn)
+            self.pruned += removed
+            conn.commit()
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {"lookups": self.lookups, "hits": self.hits, "pruned": self.pruned}
+
+
+def knowledge_store_from_env():
+    """Build the shared knowledge store, or None when KNOWLEDGE=0."""
+    if os.getenv("KNOWLEDGE", "1") == "0":
+        return None
+    return KnowledgeStore(
+        path=os.getenv("KNOWLEDGE_PATH", os.path.join(".cache", "knowledge.sqlite3")),
+        freshness=freshness_from_env(),
+        prune_every=int(os.getenv("KNOWLEDGE_PRUNE_EVERY", "100")),
+    )
+
+
+knowledge_store = knowledge_store_from_env()
+if knowledge_store is not None:
+    tracer.register_stats("knowledge", knowledge_store.stats)
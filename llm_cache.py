@@ -0,0 +1,204 @@
+"""
+Response cache for LLM calls.
+Plugs into LangChain's cache interface on the shared Gemini client. Exact
+prompts are matched by hash; near-duplicate prompts (e.g. a rerun with
+slightly different product details) can optionally be matched with MinHash
+similarity. Tasks that need fresh output opt out with `llm_cache_scope`.
+"""
+import os
+import json
+import random
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+from cache import ResultCache, make_key
+from tracing import tracer
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(1337)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+
+_scope = contextvars.ContextVar("llm_cache_scope", default={"enabled": True, "near_duplicates": True})
+
+
+@contextmanager
+def llm_cache_scope(enabled=True, near_duplicates=True):
+    """Control caching for LLM calls made inside the block, e.g. to get fresh creative output."""
+    token = _scope.set({"enabled": enabled, "near_duplicates": near_duplicates})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def _shingles(text, k=5):
+    words = text.lower().split()
+    if len(words) <= k:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def minhash(text):
+    """MinHash signature of the prompt's word 5-gram shingles."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big')
+        for s in _shingles(text)
+    ]
+    return [min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class PromptCache(BaseCache):
+    """Persistent LLM response cache with optional near-duplicate prompt matching."""
+
+    def __init__(self, store, near_threshold=None):
+        self.store = store
+        self.near_threshold = near_threshold
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._index_ready = False
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _ensure_index(self, conn):
+        if not self._index_ready:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS prompt_bands (
+                    band INTEGER NOT NULL,
+                    bucket TEXT NOT NULL,
+                    llm TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    signature TEXT NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_prompt_bands ON prompt_bands (band, bucket, llm)")
+            self._index_ready = True
+
+    @staticmethod
+    def _buckets(signature):
+        return [
+            hashlib.sha1(json.dumps(signature[i * ROWS:(i + 1) * ROWS]).encode()).hexdigest()
+            for i in range(BANDS)
+        ]
+
+    def _llm_key(self, llm_string):
+        return hashlib.sha1(llm_string.encode('utf-8')).hexdigest()
+
+    def _near_lookup(self, prompt, llm_string):
+        signature = minhash(prompt)
+        llm = self._llm_key(llm_string)
+        with self.store.connection() as conn:
+            self._ensure_index(conn)
+            candidates = {}
+            for band, bucket in enumerate(self._buckets(signature)):
+                for key, stored in conn.execute(
+                    "SELECT key, signature FROM prompt_bands WHERE band = ? AND bucket = ? AND llm = ?",
+                    (band, bucket, llm),
+                ):
+                    candidates[key] = stored
+        best_key, best_score = None, 0.0
+        for key, stored in candidates.items():
+            score = similarity(signature, json.loads(stored))
+            if score > best_score:
+                best_key, best_score = key, score
+        if best_key is None or best_score < self.near_threshold:
+            return None
+        cached = self.store.get(best_key)
+        if cached is None:
+            # The response was evicted; drop its index rows
+            with self.store.connection() as conn:
+                conn.execute("DELETE FROM prompt_bands WHERE key = ?", (best_key,))
+        return cached
+
+    def lookup(self, prompt, llm_string):
+        scope = _scope.get()
+        if not scope["enabled"]:
+            self._count("skipped")
+            return None
+        cached = self.store.get(make_key("llm", prompt, llm=llm_string))
+        if cached is not None:
+            self._count("exact_hits")
+            return [loads(g) for g in cached]
+        if self.near_threshold and scope["near_duplicates"]:
+            cached = self._near_lookup(prompt, llm_string)
+            if cached is not None:
+                self._count("near_hits")
+                return [loads(g) for g in cached]
+        self._count("misses")
+        return None
+
+    def update(self, prompt, llm_string, return_val):
+        if not _scope.get()["enabled"]:
+            return
+        key = make_key("llm", prompt, llm=llm_string)
+        self.store.set(key, [dumps(g) for g in return_val], namespace="llm")
+        if self.near_threshold:
+            signature = minhash(prompt)
+            llm = self._llm_key(llm_string)
+            with self.store.connection() as conn:
+                self._ensure_index(conn)
+                conn.execute("DELETE FROM prompt_bands WHERE key = ?", (key,))
+                conn.executemany(
+                    "INSERT INTO prompt_bands (band, bucket, llm, key, signature) VALUES (?, ?, ?, ?, ?)",
+                    [(band, bucket, llm, key, json.dumps(signature))
+                     for band, bucket in enumerate(self._buckets(signature))],
+                )
+                # Drop the index rows of responses the store has since expired or evicted,
+                # so the index stays bounded by the store's own size limits
+                conn.execute("DELETE FROM prompt_bands WHERE key NOT IN (SELECT key FROM entries)")
+
+    def clear(self, **kwargs):
+        self.store.clear()
+        with self.store.connection() as conn:
+            self._ensure_index(conn)
+            conn.execute("DELETE FROM prompt_bands")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "hit_rate": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+            }
+
+
+def prompt_cache_from_env():
+    """Build the shared prompt cache, or None when LLM_CACHE=0."""
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+    threshold = os.getenv("LLM_CACHE_NEAR_THRESHOLD")
+    store = ResultCache(
+        path=os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3")),
+        ttl=int(os.getenv("LLM_CACHE_TTL", str(7 * 86400))),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000")),
+        max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024))),
+    )
+    return PromptCache(store, near_threshold=float(threshold) if threshold else None)
+
+
+# Stages whose output should be fresh on every run, never served from cache
+SKIP_STAGES = tuple(s for s in os.getenv("LLM_CACHE_SKIP_STAGES", "ad_copy,photo").split(",") if s)
+
+prompt_cache = prompt_cache_from_env()
+if prompt_cache is not None:
+    tracer.register_stats("llm_cache", prompt_cache.stats)
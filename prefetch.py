@@ -0,0 +1,217 @@
+"""
+Speculative prefetch of the research every analysis run needs.
+
+As soon as a job is submitted, the product website is scraped and the
+predictable Serper queries (the brand's competitors and alternatives, and
+the brand on Instagram) run in the background while the agents are still
+thinking. When an agent then asks for the same page or an equivalent query,
+the tool returns the prefetched result instead of making the request, and the
+run reports how many tool calls were served this way and the time saved.
+"""
+import os
+import re
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import normalize_query, normalize_url
+from knowledge import subject_for
+from tracing import tracer
+
+QUERY_TEMPLATES = (
+    "{brand} competitors",
+    "{brand} alternatives",
+    "site:instagram.com {brand}",
+)
+N_RESULTS = 5
+
+# Words that do not change what a search is about
+FILLER = {"a", "an", "the", "of", "for", "and", "to", "in", "on", "vs", "top", "best", "com", "www", "http", "https"}
+# Second-level labels that sit between the brand and the top-level domain, as in acme.co.uk
+SECOND_LEVEL = {"co", "com", "org", "net", "gov", "ac", "edu"}
+
+_current_job = contextvars.ContextVar("prefetch_job", default=None)
+
+
+def brand_for(product_website):
+    """The brand guessed from the product's domain, e.g. "acme" for shop.acme.co.uk."""
+    labels = subject_for(product_website).split('.')
+    if len(labels) > 1:
+        labels.pop()
+    while len(labels) > 1 and labels[-1] in SECOND_LEVEL:
+        labels.pop()
+    return labels[-1]
+
+
+def query_terms(query):
+    """What a search is about, so reworded queries with the same words match."""
+    return frozenset(re.findall(r'\w+', normalize_query(query))) - FILLER
+
+
+class PrefetchItem:
+    """One background fetch and when it ran."""
+
+    def __init__(self):
+        self.future = None
+        # Set when a worker picks the fetch up, so time queued behind other jobs is not counted
+        self.started = None
+        self.duration = None
+        self.ok = False
+        self.served = 0
+
+
+class PrefetchJob:
+    """The background fetches for one product and how the agents used them."""
+
+    def __init__(self, product_website):
+        self.product_website = product_website
+        self.created_at = time.time()
+        self.items = {}
+        self.served = 0
+        self.missed = 0
+        self.saved_s = 0.0
+        self._lock = threading.Lock()
+
+    def submit(self, executor, key, fetch):
+        item = PrefetchItem()
+
+        def run():
+            item.started = time.perf_counter()
+            try:
+                with tracer.span("tool", f"prefetch_{key[0]}", cache_hit=True):
+                    result = fetch()
+            finally:
+                item.duration = time.perf_counter() - item.started
+            # The tools report failures as text; let the agent's own call try again
+            item.ok = not str(result).startswith("Error")
+            return result
+
+        with self._lock:
+            if key in self.items:
+                return
+            self.items[key] = item
+            item.future = executor.submit(run)
+
+    def serve(self, key):
+        """The prefetched result for a key, waiting for it if already running; None if there is none.
+
+        A fetch still queued behind other jobs' fetches is dropped and counted
+        as missed, and the agent's tool makes the request itself.
+        """
+        with self._lock:
+            item = self.items.get(key)
+        if item is None:
+            return None
+        requested = time.perf_counter()
+        if item.future.cancel():
+            with self._lock:
+                self.missed += 1
+            return None
+        try:
+            result = item.future.result()
+        except Exception:
+            return None
+        if not item.ok:
+            return None
+        with self._lock:
+            self.served += 1
+            item.served += 1
+            if item.served == 1:
+                # The part of the fetch that ran before the agent asked for it
+                self.saved_s += max(0.0, min(item.duration, requested - item.started))
+        return result
+
+    def stats(self):
+        with self._lock:
+            items = list(self.items.values())
+            return {
+                "prefetched": len(items),
+                "served": self.served,
+                "missed": self.missed,
+                "unused": sum(1 for item in items if not item.served),
+                "saved_s": round(self.saved_s, 2),
+            }
+
+
+class Prefetcher:
+    """Starts prefetch jobs on a shared worker pool, one per product website."""
+
+    def __init__(self, workers=4, ttl=600):
+        self.workers = workers
+        self.ttl = ttl
+        self._jobs = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch")
+        return self._executor
+
+    def start(self, product_website):
+        """Start prefetching for a product, or return the job already started for it."""
+        # tools.py serves results from this module, so import it only when prefetching
+        from tools import BrowserTools, SearchTools
+
+        url = normalize_url(product_website)
+        now = time.time()
+        with self._lock:
+            for key in [k for k, job in self._jobs.items() if now - job.created_at > self.ttl]:
+                self._jobs.pop(key)
+            job = self._jobs.get(url)
+            if job is not None:
+                return job
+            job = self._jobs[url] = PrefetchJob(product_website)
+            executor = self._pool()
+
+        job.submit(executor, ("scrape", url), lambda: BrowserTools.scrape(product_website))
+        brand = brand_for(product_website)
+        for template in QUERY_TEMPLATES:
+            query = template.format(brand=brand)
+            remember_as = ("instagram", brand) if query.startswith("site:instagram.com") else None
+            job.submit(
+                executor, ("search", query_terms(query)),
+                lambda query=query, remember_as=remember_as: SearchTools.results(query, N_RESULTS, remember_as),
+            )
+        return job
+
+    def clear(self):
+        """Forget every job so the next run of a product prefetches again."""
+        with self._lock:
+            self._jobs.clear()
+
+
+@contextmanager
+def prefetching(job):
+    """Serve tool calls made inside the block from the job's prefetched results."""
+    token = _current_job.set(job)
+    try:
+        yield job
+    finally:
+        _current_job.reset(token)
+
+
+def serve_scrape(website):
+    job = _current_job.get()
+    return job.serve(("scrape", normalize_url(website))) if job is not None else None
+
+
+def serve_search(query):
+    """The prefetched organic results of an equivalent query, or None."""
+    job = _current_job.get()
+    return job.serve(("search", query_terms(query))) if job is not None else None
+
+
+def prefetcher_from_env():
+    """Build the shared prefetcher, or None when PREFETCH=0."""
+    if os.getenv("PREFETCH", "1") == "0":
+        return None
+    return Prefetcher(
+        workers=int(os.getenv("PREFETCH_WORKERS", "4")),
+        ttl=int(os.getenv("PREFETCH_TTL", "600")),
+    )
+
+
+prefetcher = prefetcher_from_env()
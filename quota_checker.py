@@ -1,40 +1,46 @@
-import os
 import time
-from langchain_google_genai import ChatGoogleGenerativeAI
+from config import config
+from rate_limiter import limiter, is_rate_limit_error, retry_after_from_error
+from llm_cache import llm_cache_scope
 
 def check_api_quota():
     """Simple function to test if API is accessible and not over quota"""
     try:
         print("Checking Google Gemini API quota...")
         
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            google_api_key=os.environ.get('GOOGLE_API_KEY'),
-            temperature=0.1,
-            max_retries=1,
-            request_timeout=10
-        )
+        # Reuse the shared client instead of building a second one
+        llm = config.get_llm()
         
-        # Simple test query
-        response = llm.invoke("Say 'API is working' in exactly 3 words.")
+        # Simple test query, never answered from the prompt cache
+        with llm_cache_scope(enabled=False):
+            response = llm.invoke("Say 'API is working' in exactly 3 words.")
         print(f"✅ API Response: {response}")
         print("✅ Quota check passed - API is accessible")
         return True
         
     except Exception as e:
-        if "429" in str(e) or "ResourceExhausted" in str(e):
-            print("❌ Quota exceeded - you need to wait or upgrade your plan")
+        if is_rate_limit_error(e):
+            # Every key of the pool was tried; each 429 is recorded on its key
+            gemini = limiter.get("gemini")
+            wait = gemini.seconds_until_ready() or retry_after_from_error(e) or 60
+            print(f"❌ Quota exceeded on all {len(gemini)} key(s) - retry in about {wait:.0f}s or upgrade your plan")
+            for label, stats in gemini.stats()["per_key"].items():
+                print(f"   {label}: {stats}")
             print("Check: https://ai.google.dev/gemini-api/docs/rate-limits")
         else:
             print(f"❌ API Error: {str(e)}")
         return False
 
 def wait_for_quota_reset():
-    """Wait for quota to reset with countdown"""
-    print("Waiting for quota to reset...")
-    for i in range(300, 0, -30):  # Wait 5 minutes with 30-second updates
-        print(f"Waiting {i} seconds...")
-        time.sleep(30)
+    """Wait until at least one key in the pool is out of its 429 backoff window"""
+    gemini = limiter.get("gemini")
+    remaining = gemini.seconds_until_ready()
+    print(f"Waiting {remaining:.0f} seconds for quota to reset...")
+    while remaining > 0:
+        time.sleep(min(30, remaining))
+        remaining = gemini.seconds_until_ready()
+        if remaining > 0:
+            print(f"Waiting {remaining:.0f} seconds...")
     print("Attempting to check quota again...")
 
 if __name__ == "__main__":
@@ -45,7 +51,7 @@ if __name__ == "__main__":
         print("\nOptions:")
         print("1. Wait for quota to reset (usually 1 minute)")
         print("2. Upgrade your Google Gemini API plan")
-        print("3. Switch to a different API key if available")
+        print("3. Add more keys to GOOGLE_API_KEYS (comma-separated); calls fail over between them automatically")
         
         choice = input("\nWait for quota reset? (y/n): ").lower()
         if choice == 'y':
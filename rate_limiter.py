@@ -0,0 +1,563 @@
+"""
+Process-wide rate limiting for the Gemini LLM and the Serper tools.
+Each provider has a pool of API keys. Every key gets a requests-per-minute,
+an optional tokens-per-minute and an optional daily budget, shared by every
+thread and crew in the process, with adaptive backoff when the provider
+answers 429. Each call goes to the healthiest key, so a throttled or
+exhausted key fails over to the next one without restarting the crew.
+With RATE_LIMIT_SHARED_PATH set, the per-minute buckets and daily counts
+live in SQLite instead, so several processes draw on one budget.
+"""
+import os
+import re
+import time
+import random
+import sqlite3
+import datetime
+import threading
+from contextlib import contextmanager
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def _refill(self, scale=1.0):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate * scale)
+        self.updated = now
+
+    def reserve(self, amount, scale=1.0):
+        """Take `amount` tokens and return how long the caller must wait before using them."""
+        self._refill(scale)
+        # Never ask for more than a full bucket or the caller would wait forever
+        amount = min(amount, self.capacity)
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / (self.rate * scale)
+
+    def wait_for(self, amount, scale=1.0):
+        """How long a reservation of `amount` tokens would wait, without taking them."""
+        self._refill(scale)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / (self.rate * scale))
+
+    def refund(self, amount):
+        """Give back tokens that were reserved but not used."""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class SharedLimits:
+    """SQLite file holding bucket levels and daily counts shared by every process that opens it."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit mode so transaction() controls locking with BEGIN IMMEDIATE
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS daily (
+                    name TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    used INTEGER NOT NULL,
+                    PRIMARY KEY (name, day)
+                );"""
+            )
+        return self._conn
+
+    @contextmanager
+    def transaction(self):
+        """Yield the connection inside a write transaction, serialized across processes."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def bucket(self, name, rate_per_minute, capacity=None):
+        return SharedTokenBucket(self, name, rate_per_minute, capacity)
+
+    def daily_used(self, name, day):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT used FROM daily WHERE name = ? AND day = ?", (name, day)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def add_daily(self, name, day, amount=1):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO daily (name, day, used) VALUES (?, ?, ?) "
+                "ON CONFLICT (name, day) DO UPDATE SET used = used + excluded.used",
+                (name, day, amount),
+            )
+
+
+class SharedTokenBucket:
+    """TokenBucket whose level is kept in SharedLimits, so every process draws on the same budget.
+
+    Uses wall-clock time, since monotonic clocks are not comparable between processes.
+    """
+
+    def __init__(self, store, name, rate_per_minute, capacity=None):
+        self.store = store
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+
+    def _level(self, conn, scale):
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+        now = time.time()
+        if row is None:
+            return self.capacity, now
+        return min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate * scale), now
+
+    def _store(self, conn, tokens, now):
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)", (self.name, tokens, now)
+        )
+        self.tokens = tokens
+
+    def _refill(self, scale=1.0):
+        with self.store.transaction() as conn:
+            self.tokens, _ = self._level(conn, scale)
+
+    def reserve(self, amount, scale=1.0):
+        amount = min(amount, self.capacity)
+        with self.store.transaction() as conn:
+            tokens, now = self._level(conn, scale)
+            tokens -= amount
+            self._store(conn, tokens, now)
+        if tokens >= 0:
+            return 0.0
+        return -tokens / (self.rate * scale)
+
+    def wait_for(self, amount, scale=1.0):
+        self._refill(scale)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / (self.rate * scale))
+
+    def refund(self, amount):
+        with self.store.transaction() as conn:
+            tokens, now = self._level(conn, 1.0)
+            self._store(conn, min(self.capacity, tokens + amount), now)
+
+
+class ProviderLimiter:
+    """RPM/TPM budget for one provider with AIMD-style adaptive backoff on 429s."""
+
+    def __init__(self, name, rpm, tpm=None, max_backoff=300.0,
+                 clock=time.monotonic, sleep=time.sleep, shared=None):
+        self.name = name
+        self.clock = clock
+        self.sleep = sleep
+        self.max_backoff = max_backoff
+        if shared is not None:
+            self.requests = shared.bucket(f"{name}:requests", rpm) if rpm else None
+            self.tokens = shared.bucket(f"{name}:tokens", tpm) if tpm else None
+        else:
+            self.requests = TokenBucket(rpm, clock=clock) if rpm else None
+            self.tokens = TokenBucket(tpm, clock=clock) if tpm else None
+        self.scale = 1.0
+        self.backoff_until = 0.0
+        self.consecutive_429s = 0
+        self.throttled = 0
+        self.waited_s = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=0):
+        """Take one request (and `tokens` tokens) from the budget and return how long to wait before sending."""
+        with self._lock:
+            wait = max(0.0, self.backoff_until - self.clock())
+            if self.requests:
+                wait = max(wait, self.requests.reserve(1, self.scale))
+            if self.tokens and tokens:
+                wait = max(wait, self.tokens.reserve(tokens, self.scale))
+            if wait > 0:
+                self.waited_s += wait
+        return wait
+
+    def acquire(self, tokens=0):
+        """Block until one request (and `tokens` tokens) fit in the budget."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def wait_estimate(self, tokens=0):
+        """How long a call would wait right now, without reserving anything."""
+        with self._lock:
+            wait = max(0.0, self.backoff_until - self.clock())
+            if self.requests:
+                wait = max(wait, self.requests.wait_for(1, self.scale))
+            if self.tokens and tokens:
+                wait = max(wait, self.tokens.wait_for(tokens, self.scale))
+            return wait
+
+    def headroom(self):
+        """Fraction of the request bucket still available, scaled down while backing off."""
+        with self._lock:
+            if not self.requests:
+                return self.scale
+            self.requests._refill(self.scale)
+            return self.scale * max(0.0, self.requests.tokens) / self.requests.capacity
+
+    def record_usage(self, estimated, actual):
+        """Correct the TPM bucket once the real token count of a call is known."""
+        if not self.tokens or actual is None:
+            return
+        with self._lock:
+            if actual < estimated:
+                self.tokens.refund(estimated - actual)
+            else:
+                self.tokens.reserve(actual - estimated, self.scale)
+
+    def record_success(self):
+        """Slowly restore the full rate after the provider stops throttling."""
+        with self._lock:
+            self.consecutive_429s = 0
+            self.scale = min(1.0, self.scale + 0.05)
+
+    def record_rate_limited(self, retry_after=None):
+        """Pause the provider after a 429, honouring a retry-after hint when there is one."""
+        with self._lock:
+            self.throttled += 1
+            self.consecutive_429s += 1
+            self.scale = max(0.1, self.scale / 2)
+            if retry_after is None:
+                retry_after = min(self.max_backoff, 2 ** self.consecutive_429s)
+                retry_after *= random.uniform(0.5, 1.0)
+            self.backoff_until = max(self.backoff_until, self.clock() + retry_after)
+            return retry_after
+
+    def seconds_until_ready(self):
+        """How long until the provider is out of its 429 backoff window."""
+        with self._lock:
+            return max(0.0, self.backoff_until - self.clock())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "throttled": self.throttled,
+                "waited_s": round(self.waited_s, 2),
+                "rate_scale": round(self.scale, 2),
+            }
+
+
+class NoHealthyKey(RuntimeError):
+    """Every API key of a provider is disabled or out of its daily budget."""
+
+
+class ApiKey:
+    """One API key with its own rate limits, daily budget and health."""
+
+    def __init__(self, value, index, limiter, daily_limit=0, shared=None):
+        self.value = value
+        self.index = index
+        self.label = f"...{value[-4:]}" if len(value) > 8 else f"key{index}"
+        self.limiter = limiter
+        self.daily_limit = daily_limit
+        self.shared = shared
+        self.used_today = 0
+        self.day = datetime.date.today()
+        self.disabled = None
+
+    def daily_remaining(self):
+        # Provider quotas reset once a day; local midnight is close enough to spread load
+        today = datetime.date.today()
+        if today != self.day:
+            self.day = today
+            self.used_today = 0
+        if not self.daily_limit:
+            return float('inf')
+        if self.shared is not None:
+            return self.daily_limit - self.shared.daily_used(self.limiter.name, today.isoformat())
+        return self.daily_limit - self.used_today
+
+    def record_use(self):
+        self.daily_remaining()
+        self.used_today += 1
+        if self.shared is not None and self.daily_limit:
+            self.shared.add_daily(self.limiter.name, self.day.isoformat())
+
+    def usable(self):
+        return self.disabled is None and self.daily_remaining() > 0
+
+    def stats(self):
+        return {
+            **self.limiter.stats(),
+            "used_today": self.used_today,
+            "disabled": self.disabled,
+        }
+
+
+class KeyPool:
+    """API keys of one provider; each call is sent with the healthiest key.
+
+    Keys are ranked by how soon they can take the call (429 backoff, RPM and
+    TPM buckets), then by recent 429s and remaining headroom. Keys rejected
+    as invalid are disabled for the rest of the process.
+    """
+
+    def __init__(self, name, keys, rpm, tpm=None, daily_limit=0, max_backoff=300.0,
+                 clock=time.monotonic, sleep=time.sleep, shared=None):
+        self.name = name
+        self.sleep = sleep
+        self.keys = [
+            ApiKey(
+                value, i, ProviderLimiter(f"{name}[{i}]", rpm, tpm, max_backoff, clock, sleep, shared),
+                daily_limit, shared,
+            )
+            for i, value in enumerate(keys)
+        ]
+        self.failovers = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _choose(self, tokens):
+        candidates = [key for key in self.keys if key.usable()]
+        if not candidates:
+            if not self.keys:
+                raise NoHealthyKey(f"No {self.name} API key configured")
+            raise NoHealthyKey(f"All {self.name} API keys are disabled or out of daily quota")
+        return min(candidates, key=lambda key: (
+            key.limiter.wait_estimate(tokens), key.limiter.consecutive_429s, -key.limiter.headroom()
+        ))
+
+    def acquire(self, tokens=0):
+        """Pick the healthiest key, wait for its budget and return it."""
+        with self._lock:
+            key = self._choose(tokens)
+            wait = key.limiter.reserve(tokens)
+            key.record_use()
+        if wait > 0:
+            self.sleep(wait)
+        return key
+
+    def record_success(self, key):
+        key.limiter.record_success()
+
+    def record_rate_limited(self, key, retry_after=None):
+        """Back off the throttled key; the next acquire() moves on to another key if one is ready."""
+        wait = key.limiter.record_rate_limited(retry_after)
+        with self._lock:
+            if any(other is not key and other.usable() for other in self.keys):
+                self.failovers += 1
+        return wait
+
+    def disable(self, key, reason):
+        """Take a key out of rotation, e.g. after the provider rejected it."""
+        with self._lock:
+            key.disabled = reason
+            return any(other.usable() for other in self.keys)
+
+    def wait_estimate(self, tokens=0):
+        """How long a call would wait on the readiest usable key; infinite when no key is usable."""
+        waits = [key.limiter.wait_estimate(tokens) for key in self.keys if key.usable()]
+        return min(waits) if waits else float('inf')
+
+    def seconds_until_ready(self):
+        """How long until at least one usable key is out of its 429 backoff window."""
+        waits = [key.limiter.seconds_until_ready() for key in self.keys if key.usable()]
+        return min(waits) if waits else 0.0
+
+    def stats(self):
+        per_key = {key.label: key.stats() for key in self.keys}
+        return {
+            "keys": len(self.keys),
+            "usable": sum(key.usable() for key in self.keys),
+            "failovers": self.failovers,
+            "throttled": sum(s["throttled"] for s in per_key.values()),
+            "waited_s": round(sum(s["waited_s"] for s in per_key.values()), 2),
+            "per_key": per_key,
+        }
+
+
+def api_keys_from_env(list_var, single_var):
+    """Keys from a comma-separated `list_var` plus the single `single_var`, without duplicates."""
+    values = re.split(r'[,\s]+', os.getenv(list_var, "")) + [os.getenv(single_var, "")]
+    keys = []
+    for value in values:
+        value = value.strip()
+        if value and value not in keys:
+            keys.append(value)
+    return keys
+
+
+class RateLimiter:
+    """Registry of provider key pools shared across threads and crews."""
+
+    def __init__(self, providers=None):
+        self.providers = dict(providers or {})
+
+    def get(self, name):
+        return self.providers[name]
+
+    def stats(self):
+        return {name: pool.stats() for name, pool in self.providers.items()}
+
+    @classmethod
+    def from_env(cls):
+        """Build key pools and per-key limits from the environment.
+
+        Set a limit to 0 to disable it (e.g. against a local stand-in).
+        """
+        shared_path = os.getenv("RATE_LIMIT_SHARED_PATH")
+        shared = SharedLimits(shared_path) if shared_path else None
+        return cls({
+            "gemini": KeyPool(
+                "gemini",
+                api_keys_from_env("GOOGLE_API_KEYS", "GOOGLE_API_KEY"),
+                rpm=int(os.getenv("GEMINI_RPM", "15")),
+                tpm=int(os.getenv("GEMINI_TPM", "1000000")),
+                daily_limit=int(os.getenv("GEMINI_DAILY_REQUESTS", "0")),
+                shared=shared,
+            ),
+            # The other model tiers of routing.py have their own per-key limits on the same keys
+            "gemini_pro": KeyPool(
+                "gemini_pro",
+                api_keys_from_env("GOOGLE_API_KEYS", "GOOGLE_API_KEY"),
+                rpm=int(os.getenv("GEMINI_PRO_RPM", "2")),
+                tpm=int(os.getenv("GEMINI_PRO_TPM", "32000")),
+                daily_limit=int(os.getenv("GEMINI_PRO_DAILY_REQUESTS", "50")),
+                shared=shared,
+            ),
+            "gemini_lite": KeyPool(
+                "gemini_lite",
+                api_keys_from_env("GOOGLE_API_KEYS", "GOOGLE_API_KEY"),
+                rpm=int(os.getenv("GEMINI_LITE_RPM", "30")),
+                tpm=int(os.getenv("GEMINI_LITE_TPM", "1000000")),
+                daily_limit=int(os.getenv("GEMINI_LITE_DAILY_REQUESTS", "0")),
+                shared=shared,
+            ),
+            "serper": KeyPool(
+                "serper",
+                api_keys_from_env("SERPER_API_KEYS", "SERPER_API_KEY"),
+                rpm=int(os.getenv("SERPER_RPM", "300")),
+                daily_limit=int(os.getenv("SERPER_DAILY_REQUESTS", "0")),
+                shared=shared,
+            ),
+        })
+
+
+def is_rate_limit_error(error):
+    """Whether an exception is a provider 429 / quota exhaustion."""
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) == 429:
+        return True
+    text = str(error)
+    return "429" in text or "ResourceExhausted" in text or "RESOURCE_EXHAUSTED" in text
+
+
+def is_auth_error(error):
+    """Whether an exception means the API key itself was rejected (invalid, revoked, out of credits)."""
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) in (401, 403):
+        return True
+    text = str(error)
+    return "API_KEY_INVALID" in text or "PERMISSION_DENIED" in text or "PermissionDenied" in text
+
+
+def retry_after_from_error(error):
+    """Extract a retry-after hint in seconds from an HTTP or Gemini error, if present."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    # Gemini puts the hint in the error body, e.g. "retry_delay { seconds: 37 }" or "retryDelay": "37s"
+    match = re.search(r'retry_delay\s*\{\s*seconds:\s*(\d+)', str(error))
+    if not match:
+        match = re.search(r'retryDelay"?\s*:\s*"?(\d+(?:\.\d+)?)s', str(error))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def estimate_tokens(text):
+    """Rough token estimate (about 4 characters per token) used before a call is made."""
+    return max(1, len(text) // 4)
+
+
+class PooledChatModel(BaseChatModel):
+    """Chat model that sends each call through the healthiest key of a KeyPool.
+
+    `clients` holds one chat model per key, in the pool's key order. A 429 or
+    a rejected key moves the call to another key mid-run; the call only fails
+    once every key has been tried or disabled.
+    """
+
+    clients: list
+    pool: Any
+    max_output_tokens: int = 0
+    max_attempts: int = 4
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self):
+        return "pooled"
+
+    @property
+    def _identifying_params(self):
+        # The LLM cache keys on this, so every key of the pool shares cached answers
+        return self.clients[0]._identifying_params if self.clients else {}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        estimated = sum(estimate_tokens(str(m.content)) for m in messages) + self.max_output_tokens
+        attempts = max(self.max_attempts, 2 * len(self.pool))
+        for attempt in range(1, attempts + 1):
+            key = self.pool.acquire(estimated)
+            client = self.clients[key.index]
+            try:
+                result = client._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except Exception as e:
+                if is_rate_limit_error(e) and attempt < attempts:
+                    self.pool.record_rate_limited(key, retry_after_from_error(e))
+                    continue
+                if is_auth_error(e) and self.pool.disable(key, str(e)[:200]):
+                    continue
+                raise
+            self.pool.record_success(key)
+            usage = (result.llm_output or {}).get('token_usage') or {}
+            key.limiter.record_usage(estimated, usage.get('total_tokens'))
+            return result
+        raise NoHealthyKey(f"No {self.pool.name} API key accepted the call after {attempts} attempts")
+
+
+# Global key pools shared by the LLM and the tools
+limiter = RateLimiter.from_env()
@@ -0,0 +1,238 @@
+"""
+Record/replay of Gemini and Serper calls for offline runs.
+
+REPLAY_MODE=record runs normally and saves every LLM answer and Serper
+response as a fixture; REPLAY_MODE=replay serves them back from disk with a
+configurable fake latency, so the pipeline runs with no network and no API
+keys. Fixtures are JSONL files in REPLAY_DIR keyed by the exact request.
+"""
+import os
+import json
+import time
+import threading
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel, generate_from_stream
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from cache import make_key
+
+OFF, RECORD, REPLAY = "off", "record", "replay"
+
+
+class ReplayMiss(LookupError):
+    """No fixture was recorded for a request made in replay mode."""
+
+
+class FixtureStore:
+    """Append-only JSONL file of recorded responses, loaded into memory on first use."""
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                with open(self.path, encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        self._entries[record["key"]] = record["response"]
+        return self._entries
+
+    def get(self, key):
+        with self._lock:
+            return self._load().get(key)
+
+    def put(self, key, request, response):
+        with self._lock:
+            entries = self._load()
+            if entries.get(key) == response:
+                return
+            entries[key] = response
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"key": key, "request": request, "response": response}) + '\n')
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
+
+
+def messages_payload(messages):
+    """Serializable form of a chat prompt, used as the fixture key."""
+    return [[m.type, m.content if isinstance(m.content, str) else json.dumps(m.content)] for m in messages]
+
+
+def prompt_text(messages):
+    return '\n\n'.join(content for _, content in messages_payload(messages))
+
+
+class ReplayResponse:
+    """The subset of `requests.Response` the Serper tools use, backed by a recorded body."""
+
+    def __init__(self, body):
+        self.content = body.encode('utf-8') if isinstance(body, str) else body
+        self.encoding = 'utf-8'
+        self.status_code = 200
+        self.raw = None
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        body = self.content.decode(self.encoding) if decode_unicode else self.content
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class Replay:
+    """Process-wide record/replay switch with one fixture store per provider.
+
+    In replay mode a request without a fixture raises ReplayMiss, unless
+    `llm_fallback(prompt)` / `serper_fallback(url, payload)` are set to
+    synthesize a response (the offline benchmark does this).
+    """
+
+    def __init__(self, mode=OFF, directory="fixtures", llm_latency=0.0, serper_latency=0.0):
+        if mode not in (OFF, RECORD, REPLAY):
+            raise ValueError(f"REPLAY_MODE must be one of off, record, replay (got '{mode}')")
+        self.mode = mode
+        self.directory = directory
+        self.llm_latency = llm_latency
+        self.serper_latency = serper_latency
+        self.llm_fallback = None
+        self.serper_fallback = None
+        self.llm_store = FixtureStore(os.path.join(directory, "llm.jsonl"))
+        self.serper_store = FixtureStore(os.path.join(directory, "serper.jsonl"))
+        self.recorder = FixtureRecorder(self)
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    @property
+    def recording(self):
+        return self.mode == RECORD
+
+    def llm_response(self, messages):
+        """Recorded answer for a chat prompt."""
+        payload = messages_payload(messages)
+        text = self.llm_store.get(make_key("llm", payload))
+        if text is None:
+            if self.llm_fallback is None:
+                raise ReplayMiss(f"No recorded LLM response in {self.llm_store.path} for this prompt")
+            text = self.llm_fallback(prompt_text(messages))
+        if self.llm_latency:
+            time.sleep(self.llm_latency)
+        return text
+
+    def record_llm(self, messages, text):
+        payload = messages_payload(messages)
+        self.llm_store.put(make_key("llm", payload), payload, text)
+
+    def serper_response(self, url, payload):
+        """Recorded Serper response for a request."""
+        body = self.serper_store.get(make_key("serper", url, payload=payload))
+        if body is None:
+            if self.serper_fallback is None:
+                raise ReplayMiss(f"No recorded Serper response in {self.serper_store.path} for {url} {payload}")
+            body = json.dumps(self.serper_fallback(url, payload))
+        if self.serper_latency:
+            time.sleep(self.serper_latency)
+        return ReplayResponse(body)
+
+    def record_serper(self, url, payload, response):
+        """Save a live Serper response and return a replayable copy of it."""
+        body = response.content.decode('utf-8')
+        response.close()
+        self.serper_store.put(make_key("serper", url, payload=payload), {"url": url, "payload": payload}, body)
+        return ReplayResponse(body)
+
+    def stats(self):
+        return {"mode": self.mode, "llm_fixtures": len(self.llm_store), "serper_fixtures": len(self.serper_store)}
+
+
+class FixtureRecorder(BaseCallbackHandler):
+    """LangChain callback that saves each chat prompt and its answer while recording."""
+
+    def __init__(self, replay):
+        self.replay = replay
+        self._prompts = {}
+
+    def on_chat_model_start(self, serialized, messages, run_id=None, **kwargs):
+        self._prompts[run_id] = messages[0]
+
+    def on_llm_end(self, response, run_id=None, **kwargs):
+        messages = self._prompts.pop(run_id, None)
+        if messages is not None and response.generations and response.generations[0]:
+            self.replay.record_llm(messages, response.generations[0][0].text)
+
+    def on_llm_error(self, error, run_id=None, **kwargs):
+        self._prompts.pop(run_id, None)
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that answers from recorded fixtures instead of calling Gemini."""
+
+    model: str = "replay"
+    streaming: bool = False
+    chunk_size: int = 24
+
+    @property
+    def _llm_type(self):
+        return "replay"
+
+    @property
+    def _identifying_params(self):
+        return {"model": self.model}
+
+    def _answer(self, messages, stop):
+        text = replay.llm_response(messages)
+        # Honour stop sequences the way the real API does (crewai stops at "Observation")
+        for marker in stop or ():
+            index = text.find(marker)
+            if index != -1:
+                text = text[:index]
+        return text
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.streaming:
+            return generate_from_stream(self._chunks(messages, stop=stop, run_manager=run_manager))
+        text = self._answer(messages, stop)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _chunks(self, messages, stop=None, run_manager=None):
+        # Not `_stream`: like the pooled Gemini models, `stream()` then goes through `invoke()`,
+        # which is where LangChain consults the LLM cache
+        text = self._answer(messages, stop)
+        for start in range(0, len(text), self.chunk_size):
+            piece = text[start:start + self.chunk_size]
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+def replay_from_env():
+    return Replay(
+        mode=os.getenv("REPLAY_MODE", OFF).strip().lower() or OFF,
+        directory=os.getenv("REPLAY_DIR", "fixtures"),
+        llm_latency=float(os.getenv("REPLAY_LLM_LATENCY", "0")),
+        serper_latency=float(os.getenv("REPLAY_SERPER_LATENCY", "0")),
+    )
+
+
+replay = replay_from_env()
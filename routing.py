@@ -0,0 +1,178 @@
+"""
+Per-task model routing.
+
+Each pipeline stage gets a route: a model tier, a cap on output tokens and a
+temperature. Light stages (the photo description and its review) go to the
+cheaper, faster tier, creative stages get a higher temperature and every
+stage gets an output cap that fits what it writes. Each tier has its own key
+pool, and when a tier cannot take a call soon (or all of its keys answer
+429) the call moves down the tier's fallback chain instead of waiting.
+"""
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from rate_limiter import NoHealthyKey, is_rate_limit_error, estimate_tokens
+
+# Model behind each tier; override with MODEL_TIER_<TIER>, e.g. MODEL_TIER_PRO=gemini-1.5-pro-002
+TIERS = {
+    "pro": "gemini-1.5-pro",
+    "flash": "gemini-2.0-flash",
+    "lite": "gemini-2.0-flash-lite",
+}
+# Key pool in rate_limiter.limiter that budgets each tier
+TIER_POOLS = {
+    "pro": "gemini_pro",
+    "flash": "gemini",
+    "lite": "gemini_lite",
+}
+# Tiers to try, in order, after a tier's own model; never a pricier tier than the route asked for,
+# except lite, whose only way around its limits is flash
+FALLBACKS = {
+    "pro": ("flash", "lite"),
+    "flash": ("lite",),
+    "lite": ("flash",),
+}
+
+
+@dataclass(frozen=True)
+class Route:
+    """Model settings for one stage."""
+
+    tier: str
+    max_output_tokens: int
+    temperature: float
+
+
+# What every stage used before routing; also used for stages without a route
+DEFAULT_ROUTE = Route("flash", 2048, 0.1)
+
+DEFAULT_ROUTES = {
+    # Tool-using research stages keep a low temperature so the ReAct format holds
+    "product_analysis": Route("flash", 1536, 0.1),
+    "competitor_analysis": Route("flash", 1536, 0.1),
+    "campaign_development": Route("flash", 2048, 0.3),
+    "ad_copy": Route("flash", 1024, 0.5),
+    "photo": Route("lite", 768, 0.5),
+    "image": Route("lite", 768, 0.2),
+    "variants": Route("flash", 2048, 0.8),
+}
+
+
+def parse_routes(text):
+    """Routes from "stage=tier:max_output_tokens:temperature" items separated by commas."""
+    routes = {}
+    for item in text.split(","):
+        if "=" not in item:
+            continue
+        stage, spec = item.split("=", 1)
+        tier, max_output_tokens, temperature = (spec.split(":") + ["", ""])[:3]
+        base = DEFAULT_ROUTES.get(stage.strip(), DEFAULT_ROUTE)
+        routes[stage.strip()] = Route(
+            tier.strip() or base.tier,
+            int(max_output_tokens) if max_output_tokens.strip() else base.max_output_tokens,
+            float(temperature) if temperature.strip() else base.temperature,
+        )
+    return routes
+
+
+class ModelRouter:
+    """Stage routes, tier models and fallback chains, with counts of which tier served each call."""
+
+    def __init__(self, routes=None, tiers=None, fallbacks=None, max_wait=2.0):
+        self.routes = dict(DEFAULT_ROUTES if routes is None else routes)
+        self.tiers = dict(tiers or TIERS)
+        self.fallbacks = dict(FALLBACKS if fallbacks is None else fallbacks)
+        self.max_wait = max_wait
+        self.served = {}
+        self.fallback_calls = 0
+        self._lock = threading.Lock()
+
+    def route(self, stage):
+        return self.routes.get(stage, DEFAULT_ROUTE)
+
+    def chain(self, tier):
+        """The tier followed by its fallbacks, without repeats or unknown tiers."""
+        return tuple(dict.fromkeys(t for t in (tier, *self.fallbacks.get(tier, ())) if t in self.tiers))
+
+    def model(self, tier):
+        return self.tiers[tier]
+
+    def record(self, tier, fallback):
+        with self._lock:
+            self.served[tier] = self.served.get(tier, 0) + 1
+            self.fallback_calls += fallback
+
+    def reset(self):
+        with self._lock:
+            self.served = {}
+            self.fallback_calls = 0
+
+    def stats(self):
+        with self._lock:
+            return {"served": dict(self.served), "fallbacks": self.fallback_calls}
+
+
+class FallbackChatModel(BaseChatModel):
+    """Chat model that sends each call to the first tier able to take it soon.
+
+    `tiers` holds (tier, model) pairs in fallback order, each model with a
+    KeyPool as `pool` (normally a PooledChatModel). Tiers whose pool would make
+    the call wait longer than `max_wait` seconds go after the others, fastest
+    first; a tier that fails with a 429 or runs out of keys passes the call on.
+    """
+
+    tiers: list
+    max_wait: float = 2.0
+    router: Any = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self):
+        return "fallback"
+
+    @property
+    def _identifying_params(self):
+        # The LLM cache keys on this, so answers are shared per route, whichever tier served them
+        return self.tiers[0][1]._identifying_params if self.tiers else {}
+
+    def _order(self, estimated):
+        waits = [
+            (tier, model, model.pool.wait_estimate(estimated + getattr(model, "max_output_tokens", 0)))
+            for tier, model in self.tiers
+        ]
+        ready = [item for item in waits if item[2] <= self.max_wait]
+        return ready + sorted((item for item in waits if item[2] > self.max_wait), key=lambda item: item[2])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        estimated = sum(estimate_tokens(str(m.content)) for m in messages)
+        order = self._order(estimated)
+        for position, (tier, model, _) in enumerate(order):
+            try:
+                result = model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except Exception as e:
+                if position == len(order) - 1 or not (is_rate_limit_error(e) or isinstance(e, NoHealthyKey)):
+                    raise
+                continue
+            if self.router is not None:
+                self.router.record(tier, tier != self.tiers[0][0])
+            return result
+        raise NoHealthyKey("No model tier is configured for this route")
+
+
+def model_router_from_env():
+    """Build the shared router; MODEL_ROUTING=0 sends every stage to DEFAULT_ROUTE with no fallback."""
+    tiers = {tier: os.getenv(f"MODEL_TIER_{tier.upper()}", model) for tier, model in TIERS.items()}
+    if os.getenv("MODEL_ROUTING", "1") == "0":
+        routes, fallbacks = {}, {}
+    else:
+        routes, fallbacks = {**DEFAULT_ROUTES, **parse_routes(os.getenv("MODEL_ROUTES", ""))}, None
+    return ModelRouter(routes, tiers, fallbacks, max_wait=float(os.getenv("MODEL_FALLBACK_WAIT", "2")))
+
+
+model_router = model_router_from_env()
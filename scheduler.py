@@ -0,0 +1,90 @@
+"""
+Dependency-aware scheduler for the ideation pipeline.
+Steps declare the steps whose results they need and start as soon as those
+have finished, so independent steps run at the same time.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class TaskGraph:
+    """A DAG of named steps executed on a thread pool."""
+
+    def __init__(self):
+        self.steps = {}
+
+    def add(self, name, fn, needs=()):
+        """Register a step; `fn` is called with the results of `needs` as keyword arguments."""
+        if name in self.steps:
+            raise ValueError(f"Step '{name}' is already defined")
+        self.steps[name] = (fn, tuple(needs))
+        return name
+
+    def _validate(self):
+        for name, (_, needs) in self.steps.items():
+            for dep in needs:
+                if dep not in self.steps:
+                    raise ValueError(f"Step '{name}' needs unknown step '{dep}'")
+
+        # Kahn's algorithm: anything left unvisited is part of a cycle
+        remaining = {name: set(needs) for name, (_, needs) in self.steps.items()}
+        ready = [name for name, deps in remaining.items() if not deps]
+        visited = 0
+        while ready:
+            done = ready.pop()
+            visited += 1
+            for name, deps in remaining.items():
+                if done in deps:
+                    deps.remove(done)
+                    if not deps:
+                        ready.append(name)
+        if visited != len(self.steps):
+            raise ValueError("Task graph contains a cycle")
+
+    def _required(self, targets):
+        """The targets and every step they transitively need."""
+        required = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name in required:
+                continue
+            if name not in self.steps:
+                raise ValueError(f"Unknown step '{name}'")
+            required.add(name)
+            stack.extend(self.steps[name][1])
+        return required
+
+    def run(self, max_workers=None, targets=None):
+        """Run every step (or only `targets` and what they need) and return a dict of results by step name.
+
+        The first failing step stops scheduling; steps already running are
+        allowed to finish and the error is re-raised.
+        """
+        self._validate()
+        results = {}
+        pending = dict(self.steps)
+        if targets is not None:
+            required = self._required(targets)
+            pending = {name: step for name, step in pending.items() if name in required}
+        running = {}
+        max_workers = max_workers or max(1, len(pending))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while pending or running:
+                for name in [n for n, (_, needs) in pending.items() if all(d in results for d in needs)]:
+                    fn, needs = pending.pop(name)
+                    # Steps inherit the caller's context (e.g. the current tracing span)
+                    context = contextvars.copy_context()
+                    running[pool.submit(context.run, fn, **{dep: results[dep] for dep in needs})] = name
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        pending.clear()
+                        wait(running)
+                        raise error
+                    results[name] = future.result()
+        return results
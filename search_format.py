@@ -0,0 +1,122 @@
+"""
+Compact, token-efficient formatting of search results for agents.
+
+Each result becomes one line with a cleaned title, a canonical short URL
+(no scheme, www, tracking parameters or fragment) and its snippet. Results
+the task already saw in an earlier call, and snippets that repeat one shown
+before, are left out, and the whole answer is fitted to a per-call token
+budget, since every tool answer stays in the agent's context for the rest
+of the task.
+"""
+import os
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from handoff import count_tokens
+from iteration import current_task
+
+SEARCH_TOKEN_BUDGET = int(os.getenv("SEARCH_TOKEN_BUDGET", "350"))
+SNIPPET_NEAR_DUPLICATE = float(os.getenv("SNIPPET_NEAR_DUPLICATE", "0.7"))
+
+TRACKING_PARAMS = re.compile(
+    r'^(utm_\w+|gclid|gclsrc|dclid|fbclid|msclkid|yclid|igshid|igsh|mc_cid|mc_eid|_ga|_gl|'
+    r'ref|ref_src|ref_url|share_id|srsltid|spm|si|trk|cmpid|campaign_id|ved|ei|hl|img_index)$',
+    re.IGNORECASE,
+)
+# Site names search engines append to titles, e.g. "Acme (@acme) • Instagram photos and videos"
+TITLE_SUFFIX = re.compile(r'\s*[•|·\-–—]\s*(Instagram( photos and videos)?|Facebook|YouTube|LinkedIn|TikTok)\s*$')
+WORD = re.compile(r'\w+')
+
+
+def short_url(url):
+    """Canonical URL without scheme, www, tracking parameters, fragment or trailing slash."""
+    url = str(url).strip()
+    if not url:
+        return ""
+    parts = urlsplit(url if '://' in url else f"https://{url}")
+    host = parts.netloc.lower()
+    host = host[4:] if host.startswith("www.") else host
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    ])
+    return urlunsplit(('', host, parts.path.rstrip('/'), query, '')).lstrip('/')
+
+
+def clean_title(title):
+    return TITLE_SUFFIX.sub('', ' '.join(str(title).split()))
+
+
+def _terms(text):
+    return set(WORD.findall(text.lower()))
+
+
+def _near_duplicate(terms, seen, threshold):
+    return bool(terms) and any(len(terms & other) / len(terms | other) >= threshold for other in seen)
+
+
+def _fit(text, tokens):
+    """Cut text to about `tokens` tokens at a word boundary."""
+    words = text.split()
+    while words and count_tokens(' '.join(words)) > tokens:
+        words = words[:max(1, int(len(words) * 0.8))] if len(words) > 1 else []
+    return ' '.join(words) + ('…' if words and len(words) < len(text.split()) else '')
+
+
+def format_results(results, budget=None, threshold=None):
+    """Render organic results compactly within a token budget.
+
+    Inside a running task, URLs and snippets shown by earlier calls of the
+    same task are remembered and not repeated.
+    """
+    budget = SEARCH_TOKEN_BUDGET if budget is None else budget
+    threshold = SNIPPET_NEAR_DUPLICATE if threshold is None else threshold
+    task = current_task()
+    if task is not None:
+        with task._lock:
+            seen_urls, seen_snippets = set(task.shown_urls), list(task.shown_snippets)
+    else:
+        seen_urls, seen_snippets = set(), []
+
+    lines, repeated, over_budget = [], 0, 0
+    used = count_tokens("Search results:")
+    new_urls, new_snippets = [], []
+    for result in results:
+        url = short_url(result.get('link', ''))
+        if url and url in seen_urls:
+            repeated += 1
+            continue
+        title = clean_title(result.get('title', '')) or url
+        snippet = ' '.join(str(result.get('snippet', '')).split())
+        terms = _terms(snippet)
+        if snippet and _near_duplicate(terms, seen_snippets, threshold):
+            snippet = ""
+        line = f"- {title} ({url})" + (f": {snippet}" if snippet else "")
+        cost = count_tokens(line)
+        if used + cost > budget:
+            head = f"- {title} ({url})"
+            remaining = budget - used - count_tokens(head + ": ")
+            if remaining < 8:
+                over_budget += 1
+                continue
+            line = f"{head}: {_fit(snippet, remaining)}" if snippet else head
+            cost = count_tokens(line)
+        lines.append(line)
+        used += cost
+        seen_urls.add(url)
+        new_urls.append(url)
+        if snippet:
+            seen_snippets.append(terms)
+            new_snippets.append(terms)
+
+    if task is not None:
+        with task._lock:
+            task.shown_urls.update(new_urls)
+            task.shown_snippets.extend(new_snippets)
+    if repeated:
+        lines.append(f"({repeated} results already shown in this task left out)")
+    if over_budget:
+        lines.append(f"({over_budget} more results left out to stay concise)")
+    if not lines:
+        return "\nSearch results: none\n"
+    return "\nSearch results:\n" + '\n'.join(lines) + '\n'
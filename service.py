@@ -0,0 +1,218 @@
+"""
+HTTP service mode for the ideation pipeline.
+
+Jobs are accepted on POST /jobs into a bounded queue and run on a pool of
+workers; clients poll GET /jobs/{id} for status and GET /jobs/{id}/result for
+the result. When the queue is full the service answers 429 with Retry-After.
+GET /metrics exposes the tracing aggregates in Prometheus text format.
+Research for a job is prefetched from the moment it is accepted.
+
+Usage:
+    python service.py --port 8080 --workers 4 --queue-size 100
+"""
+import time
+import uuid
+import asyncio
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from tracing import tracer
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job:
+    """One ideation request and its lifecycle."""
+
+    def __init__(self, product_website, product_details):
+        self.id = uuid.uuid4().hex
+        self.product_website = product_website
+        self.product_details = product_details
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "product_website": self.product_website,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+def default_runner(workers):
+    """Build the real pipeline once and return a function that runs one product."""
+    from agents import InstaContentFactory
+    from agent_pool import AgentPool
+    from crew import run_ideation
+    from tasks import MarketingAnalysisTasks
+
+    tasks = MarketingAnalysisTasks()
+    agent_pool = AgentPool(InstaContentFactory(), size=workers)
+
+    def run(product_website, product_details):
+        with agent_pool.lease() as agents:
+            return run_ideation(tasks, agents, product_website, product_details)
+
+    return run
+
+
+def default_prefetch():
+    """Start prefetching a product's research; None when prefetch is disabled."""
+    from prefetch import prefetcher
+
+    return prefetcher.start if prefetcher is not None else None
+
+
+class IdeationService:
+    """Bounded job queue drained by a fixed number of workers."""
+
+    def __init__(self, runner, workers=4, queue_size=100, history=1000, prefetch=None):
+        self.runner = runner
+        self.prefetch = prefetch
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.jobs = OrderedDict()
+        self.history = history
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._worker_tasks = []
+
+    def submit(self, product_website, product_details):
+        """Queue a job; raises asyncio.QueueFull when the service is saturated."""
+        job = Job(product_website, product_details)
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        if self.prefetch is not None:
+            # Warm the research while the job waits for a worker
+            self.prefetch(product_website)
+        self._trim_history()
+        return job
+
+    def _trim_history(self):
+        while len(self.jobs) > self.history:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if oldest.status in (QUEUED, RUNNING):
+                break
+            self.jobs.pop(oldest_id)
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                job.result = await loop.run_in_executor(
+                    self.executor, self.runner, job.product_website, job.product_details
+                )
+                job.status = DONE
+            except Exception as e:
+                job.error = str(e)
+                job.status = FAILED
+            finally:
+                job.finished_at = time.time()
+                self.queue.task_done()
+
+    async def start(self, app=None):
+        self._worker_tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self, app=None):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False)
+
+    # HTTP handlers
+
+    async def create_job(self, request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"error": "Body must be JSON"}, status=400)
+        if not isinstance(body, dict):
+            return web.json_response({"error": "Body must be a JSON object"}, status=400)
+        product_website = body.get("product_website") or ""
+        product_details = body.get("product_details") or ""
+        if not isinstance(product_website, str) or not isinstance(product_details, str):
+            return web.json_response({"error": "product_website and product_details must be strings"}, status=400)
+        product_website = product_website.strip()
+        if not product_website:
+            return web.json_response({"error": "product_website is required"}, status=400)
+        try:
+            job = self.submit(product_website, product_details.strip())
+        except asyncio.QueueFull:
+            return web.json_response(
+                {"error": "Queue is full, retry later"}, status=429, headers={"Retry-After": "5"}
+            )
+        return web.json_response(job.to_dict(), status=202)
+
+    def _job(self, request):
+        job = self.jobs.get(request.match_info["job_id"])
+        if job is None:
+            raise web.HTTPNotFound(text="Unknown job")
+        return job
+
+    async def job_status(self, request):
+        return web.json_response(self._job(request).to_dict())
+
+    async def job_result(self, request):
+        job = self._job(request)
+        if job.status == DONE:
+            return web.json_response({"id": job.id, "status": job.status, "result": job.result})
+        if job.status == FAILED:
+            return web.json_response({"id": job.id, "status": job.status, "error": job.error}, status=500)
+        return web.json_response(job.to_dict(), status=202)
+
+    async def metrics(self, request):
+        """Prometheus text exposition of the tracing aggregates."""
+        return web.Response(text=tracer.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    async def health(self, request):
+        return web.json_response({
+            "status": "ok",
+            "queued": self.queue.qsize(),
+            "running": sum(job.status == RUNNING for job in self.jobs.values()),
+            "workers": self.workers,
+        })
+
+
+def create_app(runner=None, workers=4, queue_size=100):
+    """Build the aiohttp application; pass `runner` to swap in a stub pipeline."""
+    if runner is None:
+        service = IdeationService(default_runner(workers), workers, queue_size, prefetch=default_prefetch())
+    else:
+        service = IdeationService(runner, workers, queue_size)
+    app = web.Application()
+    app["service"] = service
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    app.router.add_post("/jobs", service.create_job)
+    app.router.add_get("/jobs/{job_id}", service.job_status)
+    app.router.add_get("/jobs/{job_id}/result", service.job_result)
+    app.router.add_get("/health", service.health)
+    app.router.add_get("/metrics", service.metrics)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the ideation pipeline over HTTP")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="Products processed at once")
+    parser.add_argument("--queue-size", type=int, default=100, help="Jobs accepted before answering 429")
+    args = parser.parse_args()
+    web.run_app(create_app(workers=args.workers, queue_size=args.queue_size), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
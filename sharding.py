@@ -0,0 +1,143 @@
+"""
+Multi-process sharded batch runs for large catalogs.
+
+The pending products are dealt across N worker processes, each running
+run_batch on its shard with its own agents and crews, so the CPU work of
+the orchestration (prompt rendering, output parsing, logging) runs in
+parallel instead of in one interpreter. The workers share the API rate
+limits through a SQLite file (RATE_LIMIT_SHARED_PATH) and the tool, LLM,
+checkpoint and knowledge stores, which are SQLite files already. When all
+workers are done, their outputs are merged into the output file in input
+order, so the result does not depend on which process finished first.
+"""
+import os
+import json
+import glob
+import time
+import shutil
+import tempfile
+import multiprocessing
+
+from crew import product_key, load_products, load_completed, run_batch
+
+SHARED_LIMITS_PATH = os.path.join(".cache", "rate_limits.sqlite3")
+
+
+def shard_products(products, shards):
+    """Deal products round-robin into `shards` lists so every process gets a similar mix."""
+    return [products[i::shards] for i in range(shards)]
+
+
+def shard_path(output_path, index):
+    return f"{output_path}.shard{index}"
+
+
+def _read_records(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A worker killed mid-write can leave a truncated last line
+                continue
+
+
+def merge_results(products, output_path, shard_paths):
+    """Merge shard outputs and earlier results into `output_path`, one record per product in input order.
+
+    A successful record wins over a failed one; otherwise the one read last
+    (shards in index order, later lines first) wins. Records of products no
+    longer in the input are kept after the others, ordered by key. The shard
+    files are removed once the merged file is in place.
+    """
+    records = {}
+    for path in [output_path, *shard_paths]:
+        if not os.path.exists(path):
+            continue
+        for record in _read_records(path):
+            if record.get('key') is None:
+                continue
+            previous = records.get(record.get('key'))
+            if previous is None or record.get('status') == 'ok' or previous.get('status') != 'ok':
+                records[record.get('key')] = record
+
+    order = list(dict.fromkeys(product_key(p['product_website'], p['product_details']) for p in products))
+    known = set(order)
+    order += sorted(key for key in records if key not in known)
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as out:
+        for key in order:
+            if key in records:
+                out.write(json.dumps(records[key]) + '\n')
+    os.replace(temp_path, output_path)
+    for path in shard_paths:
+        if os.path.exists(path):
+            os.remove(path)
+    return {
+        "ok": sum(record.get('status') == 'ok' for record in records.values()),
+        "error": sum(record.get('status') != 'ok' for record in records.values()),
+    }
+
+
+def _run_shard(input_path, output_path, concurrency, rerun, initializer):
+    """Worker process entry point: run one shard as an ordinary batch."""
+    if initializer is not None:
+        initializer()
+    run_batch(input_path, output_path, concurrency, rerun)
+
+
+def run_sharded(input_path, output_path, processes=2, concurrency=4, rerun=(), initializer=None):
+    """Run a batch across `processes` worker processes and merge their results into `output_path`.
+
+    Each worker runs `concurrency` products at a time. `initializer` (a
+    picklable function) runs first in every worker, e.g. to install stub
+    backends. Like run_batch, products with a successful result are skipped
+    unless `rerun` is set, and shards left by an interrupted run are merged
+    before starting.
+    """
+    products = load_products(input_path)
+    leftovers = glob.glob(f"{glob.escape(output_path)}.shard*")
+    if leftovers:
+        merge_results(products, output_path, sorted(leftovers))
+
+    completed = set() if rerun else load_completed(output_path)
+    pending = [
+        p for p in products
+        if product_key(p['product_website'], p['product_details']) not in completed
+    ]
+    shards = [shard for shard in shard_products(pending, max(1, processes)) if shard]
+    print(f"📦 {len(products)} products, {len(products) - len(pending)} already done, "
+          f"{len(pending)} to run in {len(shards)} processes")
+
+    failed_workers = []
+    if shards:
+        # Every worker draws on the same API budget unless told otherwise
+        os.environ.setdefault("RATE_LIMIT_SHARED_PATH", SHARED_LIMITS_PATH)
+        input_dir = tempfile.mkdtemp(prefix="shards-")
+        context = multiprocessing.get_context("spawn")
+        workers = []
+        for index, shard in enumerate(shards):
+            shard_input = os.path.join(input_dir, f"shard{index}.jsonl")
+            with open(shard_input, 'w', encoding='utf-8') as f:
+                for product in shard:
+                    f.write(json.dumps(product) + '\n')
+            worker = context.Process(
+                target=_run_shard,
+                args=(shard_input, shard_path(output_path, index), concurrency, rerun, initializer),
+                name=f"shard-{index}",
+            )
+            worker.start()
+            workers.append(worker)
+        for worker in workers:
+            worker.join()
+            if worker.exitcode != 0:
+                failed_workers.append(worker.name)
+        shutil.rmtree(input_dir, ignore_errors=True)
+
+    started = time.perf_counter()
+    counts = merge_results(products, output_path, [shard_path(output_path, i) for i in range(len(shards))])
+    merge_s = time.perf_counter() - started
+    if failed_workers:
+        print(f"⚠️ Workers {', '.join(failed_workers)} exited early; run the same command again to resume")
+    print(f"📦 Sharded batch finished: {counts['ok']}/{len(products)} succeeded, results in {output_path}")
+    return {**counts, "processes": len(shards), "failed_workers": failed_workers, "merge_s": round(merge_s, 3)}
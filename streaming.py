@@ -0,0 +1,171 @@
+"""
+Streaming support for the ideation pipeline.
+Forwards the tokens of each task's final answer as they are generated and
+emits every ad-copy / photo option as a structured event once it is complete.
+"""
+import re
+import contextvars
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import generate_from_stream
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+# "Option 2", "**Option 2:**", "### Option 2 -" ...
+OPTION_HEADER = re.compile(r'^\W*option\s*#?\s*(\d+)\b', re.IGNORECASE)
+# "2." or "2)" at the start of a line, only accepted for the next expected option
+NUMBERED_HEADER = re.compile(r'^\W*(\d+)\s*[.)]\s')
+
+_stage_handler = contextvars.ContextVar("stage_handler", default=None)
+
+
+class StreamingChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """Gemini chat model that streams every call so callbacks receive tokens as they arrive."""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return generate_from_stream(self._stream(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+
+class OptionSplitter:
+    """Incrementally splits a numbered list of options out of streamed text."""
+
+    def __init__(self, on_option):
+        self.on_option = on_option
+        self.buffer = ""
+        self.current = None
+        self.lines = []
+
+    def feed(self, text):
+        """Consume more text; complete lines are checked for option headers."""
+        self.buffer += text
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n', 1)
+            self._consume_line(line)
+
+    def _header_number(self, line):
+        expected = 1 if self.current is None else self.current + 1
+        match = OPTION_HEADER.match(line)
+        if match:
+            return int(match.group(1))
+        match = NUMBERED_HEADER.match(line)
+        if match and int(match.group(1)) == expected:
+            return expected
+        return None
+
+    def _consume_line(self, line):
+        number = self._header_number(line)
+        if number is not None and number != self.current:
+            self._emit()
+            self.current = number
+            self.lines = [line]
+        elif self.current is not None:
+            self.lines.append(line)
+
+    def _emit(self):
+        text = '\n'.join(self.lines).strip()
+        if self.current is not None and text:
+            self.on_option(self.current, text)
+        self.lines = []
+
+    def finish(self):
+        """Flush the trailing partial line and the last option."""
+        if self.buffer:
+            self._consume_line(self.buffer)
+            self.buffer = ""
+        self._emit()
+        self.current = None
+
+
+class StreamingCallbackHandler(BaseCallbackHandler):
+    """Per-stage LangChain callback that turns LLM output into pipeline events.
+
+    Only text after the agent's "Final Answer:" marker is forwarded. When the
+    model does not stream tokens, the final answer is emitted in one piece
+    when the call ends.
+    """
+
+    def __init__(self, stage, on_event, split_options=True):
+        self.stage = stage
+        self.on_event = on_event
+        self.split_options = split_options
+        self._reset()
+
+    def _reset(self):
+        self.text = ""
+        self.emitted_to = None
+        self.streamed = False
+        self.splitter = OptionSplitter(self._on_option) if self.split_options else None
+
+    def _on_option(self, index, text):
+        self.on_event({"type": "option", "stage": self.stage, "index": index, "text": text})
+
+    def _forward(self):
+        """Emit everything after the final answer marker that has not been sent yet."""
+        if self.emitted_to is None:
+            position = self.text.find(FINAL_ANSWER_MARKER)
+            if position < 0:
+                return
+            self.emitted_to = position + len(FINAL_ANSWER_MARKER)
+        chunk = self.text[self.emitted_to:]
+        if not chunk:
+            return
+        self.emitted_to = len(self.text)
+        self.on_event({"type": "token", "stage": self.stage, "text": chunk})
+        if self.splitter:
+            self.splitter.feed(chunk)
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        # Every agent iteration is a new LLM call; only the last one holds the final answer
+        self._reset()
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.streamed = True
+        self.text += token
+        self._forward()
+
+    def on_llm_end(self, response, **kwargs):
+        if not self.streamed:
+            generations = response.generations[0] if response.generations else []
+            self.text = generations[0].text if generations else ""
+            self._forward()
+        if self.emitted_to is not None and self.splitter:
+            self.splitter.finish()
+
+
+class StageEventsHandler(BaseCallbackHandler):
+    """Callback on the shared LLM clients that hands each call to the current stage's handler.
+
+    crewai gives an agent's callbacks to its executor chain only, not to the
+    LLM calls under it, and the clients are shared by every stage and
+    product, so the stage is picked from the context set by `stage_events`.
+    """
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        handler = _stage_handler.get()
+        if handler is not None:
+            handler.on_llm_start(serialized, prompts, **kwargs)
+
+    def on_llm_new_token(self, token, **kwargs):
+        handler = _stage_handler.get()
+        if handler is not None:
+            handler.on_llm_new_token(token, **kwargs)
+
+    def on_llm_end(self, response, **kwargs):
+        handler = _stage_handler.get()
+        if handler is not None:
+            handler.on_llm_end(response, **kwargs)
+
+
+@contextmanager
+def stage_events(handler):
+    """Send the events of LLM calls made inside the block to `handler` (a StreamingCallbackHandler)."""
+    token = _stage_handler.set(handler)
+    try:
+        yield handler
+    finally:
+        _stage_handler.reset(token)
+
+
+stage_events_handler = StageEventsHandler()
@@ -1,133 +1,210 @@
 from crewai import Task
 from textwrap import dedent
 
-class MarketingAnalysisTasks:
-    def product_analysis(self, agent, product_website, product_details):
-        return Task(
-            description=dedent(f"""\
-                Analyze the given product website: {product_website}.
-                Extra details provided by the customer: {product_details}.
+from handoff import summary_instructions
+
 
-                Focus on identifying unique features, benefits,
-                and the overall narrative presented.
+def handoff_section(handoff):
+    """Append the structured context from earlier tasks to a task description."""
+    if not handoff:
+        return ""
+    return f"\nHere is what your co-workers found so far:\n{handoff}\n"
+
+
+class MarketingAnalysisTasks:
+    # Prompt templates are dedented once at import; each call only binds the product inputs
+    PRODUCT_ANALYSIS = dedent("""\
+        Analyze the given product website: {product_website}.
+        Extra details provided by the customer: {product_details}.
+
+        Focus on identifying unique features, benefits,
+        and the overall narrative presented.
+        Check the local knowledge first and only research online
+        what it does not already cover.
+
+        Your final report should clearly articulate the
+        product's key selling points, its market appeal,
+        and suggestions for enhancement or positioning.
+        Emphasize the aspects that make the product stand out.
+
+        Keep in mind, attention to detail is crucial for
+        a comprehensive analysis. It's currently 2025.
+    """)
+
+    COMPETITOR_ANALYSIS = dedent("""\
+        Explore competitors of: {product_website}.
+        Extra details provided by the customer: {product_details}.
+
+        Identify the top 3 competitors and analyze their
+        strategies, market positioning, and customer perception.
+        Check the local knowledge first and only research online
+        what it does not already cover.
+
+        Your final report MUST include a detailed comparison of
+        {product_website} to their competitors.
+    """)
+
+    CAMPAIGN_DEVELOPMENT = dedent("""\
+        You're creating a targeted marketing campaign for: {product_website}.
+        Extra details provided by the customer: {product_details}.
+
+        To start this campaign we will need a strategy and creative content ideas.
+        It should be meticulously designed to captivate and engage
+        the product's target audience.
+
+        Based on your ideas your co-workers will create the content for the campaign.
+
+        Your final answer MUST be ideas that will resonate with the audience.
+    """)
+
+    INSTAGRAM_AD_COPY = dedent("""\
+        Craft an engaging Instagram post copy.
+        The copy should be punchy, captivating, concise,
+        and aligned with the product marketing strategy.
+
+        Focus on creating a message that resonates with
+        the target audience and highlights the product's
+        unique selling points.
+
+        Your ad copy must be attention-grabbing and should
+        encourage viewers to take action, whether it's
+        visiting the website, making a purchase, or learning
+        more about the product.
+
+        Your final answer MUST be 3 options for an ad copy for Instagram that
+        not only informs but also excites and persuades the audience.
+        Start each option with "Option N:".
+    """)
+
+    TAKE_PHOTOGRAPH_TASK = dedent("""\
+        You are working on a new campaign for a super important customer,
+        and you MUST take the most amazing photo ever for an Instagram post
+        regarding the product, you have the following copy:
+        {copy}
+
+        This is the product you are working with: {product_website}.
+        Extra details provided by the customer: {product_details}.
+
+        Imagine what the photo you want to take and describe it in a paragraph.
+        Here are some examples for you to follow:
+        - high tech airplane in a beautiful blue sky in a beautiful sunset super crispy beautiful 4k, professional wide shot
+        - the last supper, with Jesus and his disciples, breaking bread, close shot, soft lighting, 4k, crisp
+        - a bearded old man in the snow, using very warm clothing, with mountains full of snow behind him, soft lighting, 4k, crisp, close up to the camera
+
+        Think creatively and focus on how the image can capture the audience's
+        attention. Don't show the actual product in the photo.
+
+        Your final answer must be 3 options of photographs, each with 1 paragraph
+        describing the photograph exactly like the examples provided above.
+        Start each option with "Option N:".
+    """)
+
+    REVIEW_PHOTO = dedent("""\
+        Review the photos you got from the senior photographer.
+        Make sure it's the best possible and aligned with the product's goals,
+        review, approve, ask clarifying questions or delegate follow up work if
+        necessary to make decisions. When delegating work send the full draft
+        as part of the information.
+
+        This is the product you are working with: {product_website}.
+        Extra details provided by the customer: {product_details}.
+
+        Here are some examples of how the final photographs should look like:
+        - high tech airplane in a beautiful blue sky in a beautiful sunset super crispy beautiful 4k, professional wide shot
+        - the last supper, with Jesus and his disciples, breaking bread, close shot, soft lighting, 4k, crisp
+        - a bearded old man in the snow, using very warm clothing, with mountains full of snow behind him, soft lighting, 4k, crisp, close up to the camera
+
+        Your final answer must be 3 reviewed options of photographs,
+        each with 1 paragraph description following the examples provided above.
+        Start each option with "Option N:".
+    """)
+
+    VARIANT_COPY = dedent("""\
+        You are writing Instagram ad copy for: {product_website}.
+        Extra details provided by the customer: {product_details}.
+        {handoff}
+        Write {per_brief} distinct ad copy variants for each of these briefs:
+        {briefs}
+
+        Every variant must be punchy, captivating and concise, highlight the
+        product's unique selling points, end with a call to action and use at
+        most 5 hashtags. Write each variant in the language of its locale.
+
+        Answer only with a ```json block holding a list of objects with the keys
+        "brief" (the brief number), "text" (the ad copy) and "score" (your 1-10
+        estimate of how well it will perform with that audience).
+    """)
+
+    VARIANT_PHOTO = dedent("""\
+        You are taking photos for Instagram posts about: {product_website}.
+        Extra details provided by the customer: {product_details}.
+
+        For each ad copy below, describe one photograph for its post in one
+        paragraph, following these examples:
+        - high tech airplane in a beautiful blue sky in a beautiful sunset super crispy beautiful 4k, professional wide shot
+        - a bearded old man in the snow, using very warm clothing, with mountains full of snow behind him, soft lighting, 4k, crisp, close up to the camera
+
+        Don't show the actual product in the photo. Describe the photos in English.
+
+        Ad copies:
+        {copies}
+
+        Answer only with a ```json block holding a list of objects with the keys
+        "copy" (the copy number), "text" (the photo description) and "score"
+        (your 1-10 estimate of how well it will grab attention).
+    """)
+
+    def variant_copy_prompt(self, product_website, product_details, briefs, per_brief, handoff=None):
+        """Prompt for one batched call writing copy variants for several briefs."""
+        return self.VARIANT_COPY.format(
+            product_website=product_website, product_details=product_details,
+            handoff=handoff_section(handoff), briefs=briefs, per_brief=per_brief,
+        )
 
-                Your final report should clearly articulate the
-                product's key selling points, its market appeal,
-                and suggestions for enhancement or positioning.
-                Emphasize the aspects that make the product stand out.
+    def variant_photo_prompt(self, product_website, product_details, copies):
+        """Prompt for one batched call describing a photo for each of several copies."""
+        return self.VARIANT_PHOTO.format(
+            product_website=product_website, product_details=product_details, copies=copies,
+        )
 
-                Keep in mind, attention to detail is crucial for
-                a comprehensive analysis. It's currently 2025.
-                """),
+    def product_analysis(self, agent, product_website, product_details):
+        return Task(
+            description=self.PRODUCT_ANALYSIS.format(product_website=product_website, product_details=product_details) + summary_instructions("product_facts", "usps"),
             agent=agent,
             expected_output="A comprehensive product analysis report highlighting unique features, benefits, and market positioning opportunities."
         )
 
     def competitor_analysis(self, agent, product_website, product_details):
         return Task(
-            description=dedent(f"""\
-                Explore competitors of: {product_website}.
-                Extra details provided by the customer: {product_details}.
-
-                Identify the top 3 competitors and analyze their
-                strategies, market positioning, and customer perception.
-
-                Your final report MUST include BOTH all context about {product_website}
-                and a detailed comparison to their competitors.
-                """),
+            description=self.COMPETITOR_ANALYSIS.format(product_website=product_website, product_details=product_details) + summary_instructions("competitors"),
             agent=agent,
             expected_output="A detailed competitor analysis report identifying top 3 competitors with strategic comparisons and market positioning insights."
         )
 
-    def campaign_development(self, agent, product_website, product_details):
+    def campaign_development(self, agent, product_website, product_details, handoff=None):
         return Task(
-            description=dedent(f"""\
-                You're creating a targeted marketing campaign for: {product_website}.
-                Extra details provided by the customer: {product_details}.
-
-                To start this campaign we will need a strategy and creative content ideas.
-                It should be meticulously designed to captivate and engage
-                the product's target audience.
-
-                Based on your ideas your co-workers will create the content for the campaign.
-
-                Your final answer MUST be ideas that will resonate with the audience and
-                also include ALL context you have about the product and the customer.
-                """),
+            description=self.CAMPAIGN_DEVELOPMENT.format(product_website=product_website, product_details=product_details) + handoff_section(handoff) + summary_instructions("audience", "campaign_ideas", "usps"),
             agent=agent,
             expected_output="A comprehensive marketing campaign strategy with creative content ideas tailored to the target audience."
         )
 
-    def instagram_ad_copy(self, agent):
+    def instagram_ad_copy(self, agent, handoff=None):
         return Task(
-            description=dedent("""\
-                Craft an engaging Instagram post copy.
-                The copy should be punchy, captivating, concise,
-                and aligned with the product marketing strategy.
-
-                Focus on creating a message that resonates with
-                the target audience and highlights the product's
-                unique selling points.
-
-                Your ad copy must be attention-grabbing and should
-                encourage viewers to take action, whether it's
-                visiting the website, making a purchase, or learning
-                more about the product.
-
-                Your final answer MUST be 3 options for an ad copy for Instagram that
-                not only informs but also excites and persuades the audience.
-                """),
+            description=self.INSTAGRAM_AD_COPY + handoff_section(handoff),
             agent=agent,
             expected_output="Three compelling Instagram ad copy options that are attention-grabbing, persuasive, and aligned with the marketing strategy."
         )
 
     def take_photograph_task(self, agent, copy, product_website, product_details):
         return Task(
-            description=dedent(f"""\
-                You are working on a new campaign for a super important customer,
-                and you MUST take the most amazing photo ever for an Instagram post
-                regarding the product, you have the following copy:
-                {copy}
-
-                This is the product you are working with: {product_website}.
-                Extra details provided by the customer: {product_details}.
-
-                Imagine what the photo you want to take and describe it in a paragraph.
-                Here are some examples for you to follow:
-                - high tech airplane in a beautiful blue sky in a beautiful sunset super crispy beautiful 4k, professional wide shot
-                - the last supper, with Jesus and his disciples, breaking bread, close shot, soft lighting, 4k, crisp
-                - a bearded old man in the snow, using very warm clothing, with mountains full of snow behind him, soft lighting, 4k, crisp, close up to the camera
-
-                Think creatively and focus on how the image can capture the audience's
-                attention. Don't show the actual product in the photo.
-
-                Your final answer must be 3 options of photographs, each with 1 paragraph
-                describing the photograph exactly like the examples provided above.
-                """),
+            description=self.TAKE_PHOTOGRAPH_TASK.format(copy=copy, product_website=product_website, product_details=product_details),
             agent=agent,
             expected_output="Three creative photograph descriptions that would capture audience attention and complement the Instagram ad copy."
         )
 
-    def review_photo(self, agent, product_website, product_details):
+    def review_photo(self, agent, product_website, product_details, handoff=None):
         return Task(
-            description=dedent(f"""\
-                Review the photos you got from the senior photographer.
-                Make sure it's the best possible and aligned with the product's goals,
-                review, approve, ask clarifying questions or delegate follow up work if
-                necessary to make decisions. When delegating work send the full draft
-                as part of the information.
-
-                This is the product you are working with: {product_website}.
-                Extra details provided by the customer: {product_details}.
-
-                Here are some examples of how the final photographs should look like:
-                - high tech airplane in a beautiful blue sky in a beautiful sunset super crispy beautiful 4k, professional wide shot
-                - the last supper, with Jesus and his disciples, breaking bread, close shot, soft lighting, 4k, crisp
-                - a bearded old man in the snow, using very warm clothing, with mountains full of snow behind him, soft lighting, 4k, crisp, close up to the camera
-
-                Your final answer must be 3 reviewed options of photographs,
-                each with 1 paragraph description following the examples provided above.
-                """),
+            description=self.REVIEW_PHOTO.format(product_website=product_website, product_details=product_details) + handoff_section(handoff),
             agent=agent,
             expected_output="Three finalized and approved photograph descriptions that are aligned with the product goals and campaign strategy."
         )
\ No newline at end of file
@@ -1,114 +1,262 @@
 import os
-import json
+import re
 import requests
-import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from crewai_tools import tool
 from crewai import Agent, Task, Crew
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from cache import tool_cache, normalize_query, normalize_url
+from rate_limiter import limiter, is_rate_limit_error, is_auth_error, retry_after_from_error
+from http_client import http_client
+from extractor import extract_from_stream, EXTRACTOR_VERSION, SCRAPE_CHAR_BUDGET, SCRAPE_MIN_SCORE
+from tracing import tracer
+from handoff import count_tokens
+from replay import replay
+from knowledge import knowledge_store
+from iteration import deduplicated
+from prefetch import serve_scrape, serve_search
+from search_format import format_results
+
+BULK_WORKERS = int(os.getenv("TOOL_BULK_WORKERS", "8"))
+
+
+def post_serper(url, payload, timeout, max_attempts=3):
+    """POST to a Serper endpoint and return the decoded JSON body."""
+    response = post_serper_response(url, payload, timeout, max_attempts)
+    tracer.count("bytes", len(response.content))
+    return response.json()
+
+
+def post_serper_response(url, payload, timeout, max_attempts=3, stream=False):
+    """POST to a Serper endpoint with the healthiest API key, failing over to another key on 429s."""
+    if replay.replaying:
+        return replay.serper_response(url, payload)
+    serper = limiter.get("serper")
+    for attempt in range(1, max_attempts + 1):
+        key = serper.acquire()
+        headers = {
+            'X-API-KEY': key.value,
+            'Content-Type': 'application/json'
+        }
+        try:
+            response = http_client.post_json(url, payload, headers=headers, timeout=timeout, stream=stream)
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            if is_auth_error(e) and attempt < max_attempts and serper.disable(key, str(e)[:200]):
+                tracer.count("retries")
+                continue
+            if not is_rate_limit_error(e) or attempt == max_attempts:
+                raise
+            serper.record_rate_limited(key, retry_after_from_error(e))
+            tracer.count("retries")
+            continue
+        serper.record_success(key)
+        # Retries urllib3 made on 5xx/connection errors inside this attempt
+        history = getattr(getattr(response.raw, 'retries', None), 'history', ())
+        if history:
+            tracer.count("retries", len(history))
+        if replay.recording:
+            return replay.record_serper(url, payload, response)
+        return response
+
+
+def run_many(fn, items, max_workers=None):
+    """Apply `fn` to every item concurrently, keeping input order."""
+    items = list(items)
+    if not items:
+        return []
+    # Each call runs in a copy of the caller's context so tool spans keep their parent
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=min(len(items), max_workers or BULK_WORKERS)) as pool:
+        return list(pool.map(lambda context, item: context.run(fn, item), contexts, items))
+
 
 class BrowserTools:
     @staticmethod
     @tool("Scrape website content")
+    @deduplicated
     def scrape_and_summarize_website(website: str) -> str:
         """Useful to scrape and summarize a website content, just pass a string with
         only the full url, no need for a final slash `/`, eg: https://google.com or https://clearbit.com/about-us"""
+        return BrowserTools.scrape(website)
+
+    @staticmethod
+    @tool("Scrape several websites")
+    @deduplicated
+    def scrape_many_websites(websites: str) -> str:
+        """Useful to scrape and summarize several websites at once, e.g. competitor pages.
+        Pass the full urls separated by new lines or `|`."""
+        urls = [u.strip() for u in re.split(r'[\n|]', websites) if u.strip()]
+        return '\n'.join(
+            f"Website: {url}{content}"
+            for url, content in zip(urls, BrowserTools.scrape_many(urls))
+        )
+
+    @staticmethod
+    def scrape(website):
+        """Scrape one website through the shared cache."""
+        with tracer.span("tool", "scrape", cache_hit=True) as span:
+            prefetched = serve_scrape(website)
+            if prefetched is not None:
+                span.set(prefetched=True)
+                return prefetched
+            try:
+                return tool_cache.get_or_compute(
+                    "scrape", normalize_url(website),
+                    lambda: BrowserTools._scrape(website),
+                    budget=SCRAPE_CHAR_BUDGET, extractor=EXTRACTOR_VERSION,
+                )
+            except Exception as e:
+                span.set(error=str(e))
+                return f"Error scraping website {website}: {str(e)}"
+
+    @staticmethod
+    def scrape_many(websites, max_workers=None):
+        """Scrape a list of websites concurrently, returning results in the same order."""
+        return run_many(BrowserTools.scrape, websites, max_workers)
+
+    @staticmethod
+    def _scrape(website):
+        """Fetch and condense a website through Serper's scrape endpoint."""
+        tracer.annotate(cache_hit=False)
+        # Use Serper's web scraping endpoint, reading the body as it arrives
+        response = post_serper_response(
+            "https://scrape.serper.dev", {"url": website}, timeout=30, stream=True
+        )
+        # Serper omits the charset; the body is UTF-8 JSON
+        response.encoding = response.encoding or 'utf-8'
         try:
-            # Use Serper's web scraping endpoint
-            url = "https://scrape.serper.dev"
-            payload = json.dumps({"url": website})
-            headers = {
-                'X-API-KEY': os.environ.get('SERPER_API_KEY'),
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.post(url, headers=headers, data=payload, timeout=30)
-            response.raise_for_status()
-            
-            # Extract content from Serper response
-            scrape_data = response.json()
-            content = scrape_data.get('text', '')
-            
-            if not content:
-                return f"No content found for website: {website}"
-            
-            # DRASTICALLY reduce content to minimize API usage
-            content = content[:3000]  # Further reduced from 8000
-            
-            # Simple text processing instead of using LLM for summarization
-            # This eliminates the extra API call that was causing quota issues
-            lines = content.split('\n')
-            filtered_lines = []
-            
-            for line in lines:
-                line = line.strip()
-                if len(line) > 20 and not line.startswith(('Cookie', 'Privacy', 'Terms', 'Copyright')):
-                    filtered_lines.append(line)
-            
-            # Take only the most relevant lines
-            summarized_content = '\n'.join(filtered_lines[:50])  # Limit to 50 lines
-            
-            return f'\nScraped Content: {summarized_content}\n'
-            
-        except Exception as e:
-            return f"Error scraping website {website}: {str(e)}"
+            # Simple text processing instead of using LLM for summarization;
+            # stops downloading once enough high-value content is collected
+            content, stats = extract_from_stream(
+                response.iter_content(chunk_size=4096, decode_unicode=True),
+                budget_chars=SCRAPE_CHAR_BUDGET,
+                min_score=SCRAPE_MIN_SCORE,
+            )
+        finally:
+            response.close()
+        tracer.count("bytes", stats["chars_read"])
+        tracer.annotate(stopped_early=stats["stopped_early"])
+
+        if not content:
+            return f"No content found for website: {website}"
+
+        return f'\nScraped Content: {content}\n'
 
 
 class SearchTools:
     @staticmethod
     @tool("Search internet")
+    @deduplicated
     def search_internet(query: str) -> str:
         """Useful to search the internet about a given topic and return relevant results."""
         return SearchTools.search(query)
 
     @staticmethod
     @tool("Search instagram")
+    @deduplicated
     def search_instagram(query: str) -> str:
         """Useful to search for Instagram posts about a given topic and return relevant results."""
-        query = f"site:instagram.com {query}"
-        return SearchTools.search(query)
+        return SearchTools.search(f"site:instagram.com {query}", remember_as=("instagram", query))
 
     @staticmethod
-    def search(query, n_results=5):
-        """Search using Serper API"""
-        try:
-            url = "https://google.serper.dev/search"
-            payload = json.dumps({"q": query})
-            headers = {
-                'X-API-KEY': os.environ.get('SERPER_API_KEY'),
-                'content-type': 'application/json'
-            }
-            
-            # Add delay to respect rate limits
-            time.sleep(0.5)
-            
-            response = requests.post(url, headers=headers, data=payload, timeout=15)
-            response.raise_for_status()
-            
-            results = response.json().get('organic', [])
-            search_results = []
-            
+    @tool("Search internet for several queries")
+    @deduplicated
+    def search_internet_many(queries: str) -> str:
+        """Useful to run several internet searches at once. Pass the queries separated
+        by new lines or `|`."""
+        query_list = [q.strip() for q in re.split(r'[\n|]', queries) if q.strip()]
+        return '\n'.join(
+            f"Query: {query}{content}"
+            for query, content in zip(query_list, SearchTools.search_many(query_list))
+        )
+
+    @staticmethod
+    def search_many(queries, n_results=5, max_workers=None):
+        """Run several searches concurrently, returning results in the same order."""
+        return run_many(lambda query: SearchTools.search(query, n_results), queries, max_workers)
+
+    @staticmethod
+    def search(query, n_results=5, remember_as=None):
+        """Search using Serper API; `remember_as=(kind, subject)` also saves the findings as local knowledge."""
+        with tracer.span("tool", "search", cache_hit=True) as span:
+            try:
+                results = serve_search(query)
+                if results is None:
+                    results = SearchTools.results(query, n_results, remember_as)
+                else:
+                    span.set(prefetched=True)
+                content = format_results(results[:n_results])
+                span.set(output_tokens=count_tokens(content))
+                return content
+            except Exception as e:
+                span.set(error=str(e))
+                return f"Error searching: {str(e)}"
+
+    @staticmethod
+    def results(query, n_results=5, remember_as=None):
+        """The organic results for a query through the shared cache."""
+        results = tool_cache.get_or_compute(
+            "search", normalize_query(query),
+            lambda: SearchTools._fetch_results(query),
+        )
+        if remember_as and knowledge_store is not None:
+            kind, subject = remember_as
             for result in results[:n_results]:
-                try:
-                    search_results.append('\n'.join([
-                        f"Title: {result.get('title', 'N/A')}",
-                        f"Link: {result.get('link', 'N/A')}",
-                        f"Snippet: {result.get('snippet', 'N/A')}",
-                        "\n-----------------"
-                    ]))
-                except KeyError:
-                    continue
-
-            content = '\n'.join(search_results)
-            return f"\nSearch result: {content}\n"
-            
-        except Exception as e:
-            return f"Error searching: {str(e)}"
+                knowledge_store.add(
+                    kind, normalize_query(subject),
+                    [f"{result.get('title', '')}: {result.get('snippet', '')}"],
+                    source=result.get('link'),
+                )
+        return results
+
+    @staticmethod
+    def _fetch_results(query):
+        """Fetch the organic results for a query from Serper."""
+        tracer.annotate(cache_hit=False)
+        data = post_serper("https://google.serper.dev/search", {"q": query}, timeout=15)
+        return data.get('organic', [])
+
+
+class KnowledgeTools:
+    @staticmethod
+    @tool("Search local knowledge")
+    @deduplicated
+    def search_knowledge(query: str) -> str:
+        """Useful to look up product facts, competitor profiles and Instagram findings
+        from earlier campaigns. Always check this first, and only search the internet or
+        scrape websites for what it does not cover. Pass a product website, brand or topic."""
+        return KnowledgeTools.lookup(query)
+
+    @staticmethod
+    def lookup(query, limit=8):
+        """Fresh local knowledge matching the query, formatted for an agent."""
+        with tracer.span("tool", "knowledge") as span:
+            if knowledge_store is None:
+                return "Local knowledge is disabled. Search the internet instead."
+            try:
+                entries = knowledge_store.search(query, limit=limit)
+            except Exception as e:
+                span.set(error=str(e))
+                return f"Error reading local knowledge: {str(e)}"
+            span.set(hits=len(entries))
+            if not entries:
+                return f"No fresh local knowledge about '{query}'. Search the internet instead."
+            lines = [
+                f"- [{entry['kind']}, {entry['subject']}, {entry['age_days']:.0f} days old] {entry['text']}"
+                for entry in entries
+            ]
+            return "\nLocal knowledge:\n" + '\n'.join(lines) + '\n'
 
 
 # Available tools list for easy import
 available_tools = [
+    KnowledgeTools.search_knowledge,
     BrowserTools.scrape_and_summarize_website,
+    BrowserTools.scrape_many_websites,
     SearchTools.search_internet,
+    SearchTools.search_internet_many,
     SearchTools.search_instagram
 ]
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""
+Lightweight tracing for the ideation pipeline.
+Records spans for crews, tasks, agent iterations, tool calls and LLM calls
+with wall time, tokens, bytes fetched and retries. Spans can be streamed to a
+JSONL file, exposed in Prometheus text format and summarized in a table.
+"""
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from handoff import count_tokens
+
+SUMMED_ATTRS = ("input_tokens", "output_tokens", "bytes", "retries")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed unit of work."""
+
+    __slots__ = ("id", "parent_id", "kind", "name", "start", "end", "attrs")
+
+    def __init__(self, kind, name, parent_id=None, **attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.kind = kind
+        self.name = name
+        self.start = time.time()
+        self.end = None
+        self.attrs = attrs
+
+    @property
+    def duration(self):
+        return (self.end or time.time()) - self.start
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key, amount):
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "name": self.name,
+            "start": self.start,
+            "duration_s": round(self.duration, 4),
+            **{k: v for k, v in self.attrs.items() if not k.startswith('_')},
+        }
+
+
+class Tracer:
+    """Collects finished spans and per-(kind, name) aggregates."""
+
+    def __init__(self, jsonl_path=None, keep=10000):
+        self.jsonl_path = jsonl_path
+        self.spans = deque(maxlen=keep)
+        self.aggregates = {}
+        self.stats_sources = {}
+        self._lock = threading.Lock()
+
+    def register_stats(self, name, stats):
+        """Show `stats()` (a dict of counters) in the profile summary and the Prometheus output."""
+        with self._lock:
+            self.stats_sources[name] = stats
+
+    def source_stats(self):
+        with self._lock:
+            sources = sorted(self.stats_sources.items())
+        return {name: stats() for name, stats in sources}
+
+    def reset(self):
+        """Drop finished spans and aggregates, e.g. between benchmark rounds."""
+        with self._lock:
+            self.spans.clear()
+            self.aggregates.clear()
+
+    def current(self):
+        return _current_span.get()
+
+    def start(self, kind, name, **attrs):
+        """Start a span under the current one without making it current (for callbacks)."""
+        parent = _current_span.get()
+        return Span(kind, name, parent.id if parent else None, **attrs)
+
+    def finish(self, span, error=None):
+        span.end = time.time()
+        if error is not None:
+            span.set(error=str(error))
+        failed = "error" in span.attrs
+        record = span.to_dict()
+        with self._lock:
+            self.spans.append(span)
+            agg = self.aggregates.setdefault((span.kind, span.name), {
+                "count": 0, "errors": 0, "duration_s": 0.0, **{k: 0 for k in SUMMED_ATTRS}
+            })
+            agg["count"] += 1
+            agg["errors"] += failed
+            agg["duration_s"] += span.duration
+            for key in SUMMED_ATTRS:
+                agg[key] += span.attrs.get(key, 0) or 0
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + '\n')
+
+    @contextmanager
+    def span(self, kind, name, **attrs):
+        """Time a block as a child of the current span: `with tracer.span("tool", "search") as s:`."""
+        span = self.start(kind, name, **attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            _current_span.reset(token)
+            self.finish(span, error=e)
+            raise
+        _current_span.reset(token)
+        self.finish(span)
+
+    def annotate(self, **attrs):
+        """Add attributes to the current span, if any."""
+        span = _current_span.get()
+        if span is not None:
+            span.set(**attrs)
+
+    def count(self, key, amount=1):
+        """Add to a numeric attribute of the current span, if any."""
+        span = _current_span.get()
+        if span is not None:
+            span.add(key, amount)
+
+    def render_prometheus(self):
+        """Aggregates in Prometheus text exposition format."""
+        with self._lock:
+            items = sorted(self.aggregates.items())
+        metrics = [
+            ("ideation_span_total", "counter", "Finished spans", "count"),
+            ("ideation_span_errors_total", "counter", "Spans that failed", "errors"),
+            ("ideation_span_seconds_total", "counter", "Wall time spent in spans", "duration_s"),
+            ("ideation_input_tokens_total", "counter", "Input tokens", "input_tokens"),
+            ("ideation_output_tokens_total", "counter", "Output tokens", "output_tokens"),
+            ("ideation_bytes_fetched_total", "counter", "Bytes fetched by tools", "bytes"),
+            ("ideation_retries_total", "counter", "Retried requests", "retries"),
+        ]
+        lines = []
+        for metric, metric_type, help_text, key in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for (kind, name), agg in items:
+                lines.append(f'{metric}{{kind="{kind}",name="{name}"}} {agg[key]}')
+        # Counters of the caches and stores, e.g. ideation_tool_cache_hits
+        for source, stats in self.source_stats().items():
+            for key, value in sorted(stats.items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric = f"ideation_{source}_{key}"
+                    lines.append(f"# TYPE {metric} gauge")
+                    lines.append(f"{metric} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def summary_table(self):
+        """Human-readable per-stage profile, slowest first."""
+        with self._lock:
+            items = sorted(self.aggregates.items(), key=lambda item: -item[1]["duration_s"])
+        header = f"{'kind':<11} {'name':<32} {'count':>6} {'total s':>9} {'avg s':>7} {'in tok':>8} {'out tok':>8} {'bytes':>9} {'retries':>7}"
+        lines = [header, '-' * len(header)]
+        for (kind, name), agg in items:
+            lines.append(
+                f"{kind:<11} {name[:32]:<32} {agg['count']:>6} {agg['duration_s']:>9.2f} "
+                f"{agg['duration_s'] / agg['count']:>7.2f} {agg['input_tokens']:>8} {agg['output_tokens']:>8} "
+                f"{agg['bytes']:>9} {agg['retries']:>7}"
+            )
+        for source, stats in self.source_stats().items():
+            counters = ', '.join(
+                f"{key} {value:.0%}" if key.endswith("rate") else f"{key} {value}"
+                for key, value in stats.items() if isinstance(value, (int, float)) and not isinstance(value, bool)
+            )
+            lines.append(f"{source}: {counters}")
+        return '\n'.join(lines)
+
+    def step_callback(self, step):
+        """crewai step_callback: records one agent iteration; printing is opt-in via CREW_STEP_LOG=1."""
+        span = _current_span.get()
+        now = time.time()
+        if span is not None:
+            last = span.attrs.get("_last_step", span.start)
+            iteration = Span("agent_step", span.name, span.id)
+            iteration.start = last
+            iteration.end = now
+            span.attrs["_last_step"] = now
+            span.add("iterations", 1)
+            self.finish(iteration)
+        if STEP_LOG:
+            print(f"Agent step: {step}")
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """LangChain callback recording a span per LLM call."""
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self._spans = {}
+
+    def on_llm_start(self, serialized, prompts, run_id=None, **kwargs):
+        self._spans[run_id] = self.tracer.start(
+            "llm", "gemini", input_tokens=sum(count_tokens(p) for p in prompts)
+        )
+
+    def on_llm_end(self, response, run_id=None, **kwargs):
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        text = ''.join(g.text for generations in response.generations for g in generations)
+        span.set(output_tokens=count_tokens(text))
+        self.tracer.finish(span)
+
+    def on_llm_error(self, error, run_id=None, **kwargs):
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            self.tracer.finish(span, error=error)
+
+
+STEP_LOG = os.getenv("CREW_STEP_LOG", "0") == "1"
+
+# Global tracer; set TRACE_JSONL to stream finished spans to a file
+tracer = Tracer(jsonl_path=os.getenv("TRACE_JSONL") or None)
+tracing_handler = TracingCallbackHandler(tracer)
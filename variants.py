@@ -0,0 +1,216 @@
+"""
+Variant fanout: many ad copy and photo options from one shared analysis.
+
+A matrix of tones, audiences and locales is turned into briefs. Copy for
+several briefs is written in one structured LLM call, and photo descriptions
+for several copies in another, all sharing the upstream analysis context that
+the pipeline produced once. Results are deduplicated and ranked.
+"""
+import os
+import re
+import json
+import itertools
+import threading
+import contextvars
+from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor
+
+from handoff import count_tokens
+from llm_cache import llm_cache_scope, minhash, similarity
+from tracing import tracer
+
+JSON_BLOCK = re.compile(r'```(?:json)?\s*(\[.*?\])\s*```', re.DOTALL)
+CALL_TO_ACTION = re.compile(
+    r'\b(shop|buy|order|discover|try|get|join|visit|learn|sign up|book|grab|link in bio)\b', re.IGNORECASE
+)
+
+BATCH_SIZE = int(os.getenv("VARIANT_BATCH_SIZE", "6"))
+WORKERS = int(os.getenv("VARIANT_WORKERS", "4"))
+NEAR_DUPLICATE = float(os.getenv("VARIANT_NEAR_DUPLICATE", "0.8"))
+
+
+@dataclass
+class Variant:
+    """One generated option with the brief it was written for."""
+
+    stage: str
+    text: str
+    tone: str
+    audience: str
+    locale: str
+    model_score: float = 5.0
+    score: float = 0.0
+    copy: str = None
+
+
+def variant_matrix(tones, audiences, locales):
+    """Every combination of tone, audience and locale as a brief."""
+    return [
+        {"tone": tone, "audience": audience, "locale": locale}
+        for tone, audience, locale in itertools.product(tones or ["engaging"], audiences or ["general"], locales or ["en-US"])
+    ]
+
+
+def parse_items(text):
+    """The list of objects in a structured answer, tolerating prose around the JSON."""
+    match = JSON_BLOCK.search(text)
+    candidate = match.group(1) if match else text[text.find('['):text.rfind(']') + 1]
+    try:
+        items = json.loads(candidate)
+    except (json.JSONDecodeError, ValueError):
+        return []
+    return [item for item in items if isinstance(item, dict) and str(item.get("text", "")).strip()]
+
+
+def _pick(batch, number):
+    """The batch entry an answer refers to by its 1-based number, or None when the number is not in the batch."""
+    try:
+        index = int(number)
+    except (TypeError, ValueError):
+        return None
+    # Guard the lower bound too, or 0 and negatives would wrap around to the last entries
+    return batch[index - 1] if 1 <= index <= len(batch) else None
+
+
+def _model_score(item):
+    try:
+        return max(0.0, min(10.0, float(item.get("score", 5))))
+    except (TypeError, ValueError):
+        return 5.0
+
+
+def _normalized(text):
+    return ' '.join(re.sub(r'[^\w\s#]', ' ', text.lower()).split())
+
+
+def dedupe(variants, threshold=NEAR_DUPLICATE):
+    """Drop exact and near-duplicate variants, keeping the better-scored one of each group."""
+    kept, signatures, seen = [], [], set()
+    for variant in sorted(variants, key=lambda v: -v.model_score):
+        normalized = _normalized(variant.text)
+        if normalized in seen:
+            continue
+        signature = minhash(normalized)
+        if any(similarity(signature, other) >= threshold for other in signatures):
+            continue
+        seen.add(normalized)
+        signatures.append(signature)
+        kept.append(variant)
+    return kept
+
+
+def heuristic_score(variant, usps=()):
+    """0-1 score for Instagram fitness: length, call to action, hashtags and USP coverage."""
+    text = variant.text
+    if variant.stage == "copy":
+        length = 1.0 if 60 <= len(text) <= 250 else 0.5
+        cta = 1.0 if CALL_TO_ACTION.search(text) else 0.0
+        hashtags = len(re.findall(r'#\w+', text))
+        tags = 1.0 if 1 <= hashtags <= 5 else 0.5 if hashtags == 0 else 0.0
+    else:
+        length = 1.0 if 150 <= len(text) <= 700 else 0.5
+        cta = tags = 1.0
+    words = set(_normalized(text).split())
+    usp_words = {w for usp in usps for w in _normalized(usp).split() if len(w) > 4}
+    coverage = min(1.0, len(words & usp_words) / 3) if usp_words else 0.5
+    return (length + cta + tags + coverage) / 4
+
+
+def rank(variants, usps=()):
+    """Score every variant by the model's estimate and the heuristics, best first."""
+    for variant in variants:
+        variant.score = round(0.5 * variant.model_score / 10 + 0.5 * heuristic_score(variant, usps), 3)
+    return sorted(variants, key=lambda v: -v.score)
+
+
+class VariantGenerator:
+    """Writes copy and photo variants in batched LLM calls."""
+
+    def __init__(self, llm, tasks, batch_size=BATCH_SIZE, workers=WORKERS):
+        self.llm = llm
+        self.tasks = tasks
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    def _call(self, stage, prompt):
+        # Variants are meant to be fresh, so they never come from the LLM cache
+        with tracer.span("task", f"{stage}_variants"), llm_cache_scope(enabled=False):
+            answer = self.llm.invoke(prompt)
+        text = answer.content if hasattr(answer, "content") else str(answer)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += count_tokens(prompt)
+            self.output_tokens += count_tokens(text)
+        return parse_items(text)
+
+    def _map(self, fn, batches):
+        # Each batch runs in a copy of the caller's context so its spans keep their parent
+        contexts = [contextvars.copy_context() for _ in batches]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(batches) or 1)) as pool:
+            return list(pool.map(lambda context, batch: context.run(fn, batch), contexts, batches))
+
+    def _batches(self, items):
+        return [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+
+    def copies(self, product_website, product_details, briefs, per_brief, handoff=None):
+        """Copy variants for every brief, `per_brief` each."""
+        # Fewer briefs per call when each needs many variants keeps answers within the output limit
+        per_call = max(1, self.batch_size // max(1, per_brief))
+        batches = [briefs[i:i + per_call] for i in range(0, len(briefs), per_call)]
+
+        def write(batch):
+            listing = '\n'.join(
+                f"{n}. tone: {b['tone']}; audience: {b['audience']}; locale: {b['locale']}"
+                for n, b in enumerate(batch, 1)
+            )
+            prompt = self.tasks.variant_copy_prompt(product_website, product_details, listing, per_brief, handoff)
+            variants = []
+            for item in self._call("copy", prompt):
+                brief = _pick(batch, item.get("brief", 1))
+                if brief is None:
+                    continue
+                variants.append(Variant("copy", str(item["text"]).strip(), model_score=_model_score(item), **brief))
+            return variants
+
+        return [variant for batch in self._map(write, batches) for variant in batch]
+
+    def photos(self, product_website, product_details, copies):
+        """One photo description per copy variant."""
+
+        def describe(batch):
+            listing = '\n'.join(f"{n}. {copy.text}" for n, copy in enumerate(batch, 1))
+            prompt = self.tasks.variant_photo_prompt(product_website, product_details, listing)
+            variants = []
+            for item in self._call("photo", prompt):
+                copy = _pick(batch, item.get("copy", 1))
+                if copy is None:
+                    continue
+                variants.append(Variant(
+                    "photo", str(item["text"]).strip(), copy.tone, copy.audience, copy.locale,
+                    model_score=_model_score(item), copy=copy.text,
+                ))
+            return variants
+
+        return [variant for batch in self._map(describe, self._batches(copies)) for variant in batch]
+
+    def run(self, product_website, product_details, briefs, per_brief=2, handoff=None, usps=(), photos=True):
+        """Generate, deduplicate and rank copy variants, then photos for the kept copies."""
+        copies = rank(dedupe(self.copies(product_website, product_details, briefs, per_brief, handoff)), usps)
+        photo_variants = []
+        if photos and copies:
+            photo_variants = rank(dedupe(self.photos(product_website, product_details, copies)), usps)
+        variants = len(copies) + len(photo_variants)
+        return {
+            "copy": [asdict(v) for v in copies],
+            "photo": [asdict(v) for v in photo_variants],
+            "cost": {
+                "llm_calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "tokens_per_variant": round((self.prompt_tokens + self.output_tokens) / variants, 1) if variants else None,
+            },
+        }